@@ -4,6 +4,8 @@ Django settings for eBay Price Finder project.
 import os
 from pathlib import Path
 
+import django
+
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -12,6 +14,9 @@ except ImportError:
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Local state shared by all worker processes on this host (token cache, locks).
+CACHE_DIR = Path(os.getenv('CACHE_DIR', BASE_DIR / '.cache'))
+
 SECRET_KEY = os.getenv('SECRET_KEY', 'django-insecure-dev-key-change-in-production')
 
 DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
@@ -29,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'finder.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,7 +48,8 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend, with rendering timed for the Server-Timing header.
+        'BACKEND': 'finder.timing.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -58,11 +65,77 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (the default) or postgres. Connections are kept open for
+# DB_CONN_MAX_AGE seconds instead of being opened for every request.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite').lower()
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+
+# Applied to every SQLite connection as it is opened (see finder.db).
+# The journal mode is stored in the database file, so set it back explicitly
+# (e.g. DELETE) rather than leaving it blank to turn WAL off.
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '5'))
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+
+if DB_ENGINE in ('postgres', 'postgresql'):
+    # Requires psycopg. DB_POOL=true uses Django's connection pool (Django
+    # 5.1+ with psycopg[pool]) in place of persistent connections.
+    _postgres = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('DB_NAME', 'price_finder'),
+        'USER': os.getenv('DB_USER', ''),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', ''),
+        'PORT': os.getenv('DB_PORT', ''),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if os.getenv('DB_POOL', 'False').lower() == 'true':
+        _postgres['CONN_MAX_AGE'] = 0
+        _postgres['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        }
+    DATABASES = {'default': _postgres}
+    # Views marked with finder.db.use_replica read from DB_REPLICA_HOST.
+    if os.getenv('DB_REPLICA_HOST'):
+        DATABASES['replica'] = dict(
+            _postgres,
+            HOST=os.getenv('DB_REPLICA_HOST'),
+            PORT=os.getenv('DB_REPLICA_PORT', _postgres['PORT']),
+            OPTIONS=dict(_postgres['OPTIONS']),
+            TEST={'MIRROR': 'default'},
+        )
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {},
+        }
     }
+    if django.VERSION >= (5, 1):
+        # Take the write lock when a transaction starts, so writers queue on
+        # busy_timeout instead of failing when a read lock cannot be upgraded.
+        DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+
+DATABASE_ROUTERS = ['finder.db.ReplicaRouter'] if 'replica' in DATABASES else []
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared across worker processes; backs the eBay search-result cache.
+    'search': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SEARCH_CACHE_LOCATION', str(CACHE_DIR / 'search')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '5000')),
+        },
+    },
 }
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -97,8 +170,115 @@ EBAY_APP_ID = os.getenv('EBAY_APP_ID', '')
 EBAY_CERT_ID = os.getenv('EBAY_CERT_ID', '')
 EBAY_DEV_ID = os.getenv('EBAY_DEV_ID', '')
 
+# Override to point at `manage.py ebay_stub` (or the eBay sandbox); empty
+# means the production endpoints.
+EBAY_OAUTH_TOKEN_URL = os.getenv('EBAY_OAUTH_TOKEN_URL', '')
+EBAY_BROWSE_API_URL = os.getenv('EBAY_BROWSE_API_URL', '')
+
+EBAY_TOKEN_CACHE_PATH = os.getenv('EBAY_TOKEN_CACHE_PATH', str(CACHE_DIR / 'ebay_token.json'))
+# Refresh the application token this many seconds before it expires.
+EBAY_TOKEN_REFRESH_MARGIN = int(os.getenv('EBAY_TOKEN_REFRESH_MARGIN', '300'))
+
+# Shared keep-alive HTTP pool for eBay calls.
+EBAY_HTTP_POOL_SIZE = int(os.getenv('EBAY_HTTP_POOL_SIZE', '10'))
+EBAY_HTTP_CONNECT_TIMEOUT = float(os.getenv('EBAY_HTTP_CONNECT_TIMEOUT', '3.05'))
+EBAY_HTTP_READ_TIMEOUT = float(os.getenv('EBAY_HTTP_READ_TIMEOUT', '10'))
+EBAY_HTTP_MAX_RETRIES = int(os.getenv('EBAY_HTTP_MAX_RETRIES', '2'))
+EBAY_HTTP_BACKOFF_BASE = float(os.getenv('EBAY_HTTP_BACKOFF_BASE', '0.25'))
+EBAY_HTTP_BACKOFF_MAX = float(os.getenv('EBAY_HTTP_BACKOFF_MAX', '4'))
+
+# Host-wide budget for outbound eBay calls, shared by all worker processes
+# through a SQLite file. Set EBAY_RATE_LIMIT_PER_SECOND=0 to disable.
+# Batch callers leave EBAY_RATE_LIMIT_BATCH_RESERVE of the burst and of the
+# daily quota to interactive requests; waits beyond the max raise an error.
+EBAY_RATE_LIMIT_PATH = os.getenv('EBAY_RATE_LIMIT_PATH', str(CACHE_DIR / 'ebay_ratelimit.sqlite3'))
+EBAY_RATE_LIMIT_PER_SECOND = float(os.getenv('EBAY_RATE_LIMIT_PER_SECOND', '5'))
+EBAY_RATE_LIMIT_BURST = int(os.getenv('EBAY_RATE_LIMIT_BURST', '10'))
+EBAY_DAILY_CALL_QUOTA = int(os.getenv('EBAY_DAILY_CALL_QUOTA', '5000'))
+EBAY_RATE_LIMIT_BATCH_RESERVE = float(os.getenv('EBAY_RATE_LIMIT_BATCH_RESERVE', '0.2'))
+EBAY_RATE_LIMIT_MAX_WAIT = float(os.getenv('EBAY_RATE_LIMIT_MAX_WAIT', '2'))
+EBAY_RATE_LIMIT_BATCH_MAX_WAIT = float(os.getenv('EBAY_RATE_LIMIT_BATCH_MAX_WAIT', '60'))
+
+# Search results are fresh for TTL seconds, then served stale for up to
+# STALE_TTL more seconds while they are revalidated in the background.
+EBAY_SEARCH_CACHE_TTL = int(os.getenv('EBAY_SEARCH_CACHE_TTL', '300'))
+EBAY_SEARCH_CACHE_STALE_TTL = int(os.getenv('EBAY_SEARCH_CACHE_STALE_TTL', '900'))
+EBAY_SEARCH_CACHE_LOCAL_SIZE = int(os.getenv('EBAY_SEARCH_CACHE_LOCAL_SIZE', '256'))
+EBAY_SEARCH_CACHE_ALIAS = os.getenv('EBAY_SEARCH_CACHE_ALIAS', 'search')
+# Concurrent misses for one search share a single eBay call within a process;
+# this extends that across processes via a lock table, with followers
+# waiting up to EBAY_SEARCH_LOCK_TIMEOUT seconds for the leader's result.
+EBAY_SEARCH_COALESCE_ACROSS_PROCESSES = os.getenv('EBAY_SEARCH_COALESCE_ACROSS_PROCESSES', 'False').lower() == 'true'
+EBAY_SEARCH_LOCK_TIMEOUT = float(os.getenv('EBAY_SEARCH_LOCK_TIMEOUT', '15'))
+
+# Deep searches page past the 200-item Browse API limit concurrently.
+EBAY_DEEP_SEARCH_MAX_ITEMS = int(os.getenv('EBAY_DEEP_SEARCH_MAX_ITEMS', '1000'))
+EBAY_DEEP_SEARCH_CONCURRENCY = int(os.getenv('EBAY_DEEP_SEARCH_CONCURRENCY', '4'))
+
+# Batch searches (api/search/batch/) fan out over this many threads and
+# return whatever has finished once the deadline (seconds) passes.
+EBAY_BATCH_SEARCH_CONCURRENCY = int(os.getenv('EBAY_BATCH_SEARCH_CONCURRENCY', '8'))
+EBAY_BATCH_SEARCH_DEADLINE = float(os.getenv('EBAY_BATCH_SEARCH_DEADLINE', '25'))
+EBAY_BATCH_SEARCH_MAX_KEYWORDS = int(os.getenv('EBAY_BATCH_SEARCH_MAX_KEYWORDS', '500'))
+
+# Rows per INSERT statement when persisting search results.
+SEARCH_RESULT_BATCH_SIZE = int(os.getenv('SEARCH_RESULT_BATCH_SIZE', '500'))
+
+# Rows per page on the product and results pages (and their JSON endpoints).
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', '24'))
+PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', '100'))
+
+# api_search answers from stored listings matching the query (see
+# finder.price_index) when at least LOCAL_ESTIMATE_MIN_MATCHES distinct ones
+# were seen within LOCAL_ESTIMATE_MAX_AGE_HOURS, and searches eBay otherwise
+# or when called with live=1.
+LOCAL_ESTIMATE_ENABLED = os.getenv('LOCAL_ESTIMATE_ENABLED', 'True').lower() == 'true'
+LOCAL_ESTIMATE_MIN_MATCHES = int(os.getenv('LOCAL_ESTIMATE_MIN_MATCHES', '20'))
+LOCAL_ESTIMATE_MAX_AGE_HOURS = float(os.getenv('LOCAL_ESTIMATE_MAX_AGE_HOURS', '24'))
+LOCAL_ESTIMATE_MAX_MATCHES = int(os.getenv('LOCAL_ESTIMATE_MAX_MATCHES', '500'))
+
+# Image uploads are recognized and searched by `manage.py run_search_worker`.
+SEARCH_JOBS_ASYNC = os.getenv('SEARCH_JOBS_ASYNC', 'True').lower() == 'true'
+SEARCH_JOB_MAX_ATTEMPTS = int(os.getenv('SEARCH_JOB_MAX_ATTEMPTS', '3'))
+SEARCH_JOB_VISIBILITY_TIMEOUT = int(os.getenv('SEARCH_JOB_VISIBILITY_TIMEOUT', '300'))
+SEARCH_JOB_RETRY_DELAY = int(os.getenv('SEARCH_JOB_RETRY_DELAY', '10'))
+# Upper bound on jobs running at once across all workers.
+SEARCH_JOB_MAX_RUNNING = int(os.getenv('SEARCH_JOB_MAX_RUNNING', '4'))
+
 GOOGLE_APPLICATION_CREDENTIALS = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', '')
 if not GOOGLE_APPLICATION_CREDENTIALS:
     default_creds = BASE_DIR / 'config' / 'api.json'
     if default_creds.exists():
         GOOGLE_APPLICATION_CREDENTIALS = str(default_creds)
+
+# Per-request phase timings (eBay, Vision, pricing, db, template) are kept in
+# histograms served at /metrics. The Server-Timing header shows them in the
+# browser's network panel; turn it off if clients should not see them.
+# /metrics answers requests sending "Authorization: Bearer <METRICS_TOKEN>",
+# and is closed while no token is set. METRICS_ALLOW_LOOPBACK also opens it to
+# requests from 127.0.0.1/::1; leave it off behind a reverse proxy on the same
+# host, where every request arrives from loopback.
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'True').lower() == 'true'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOW_LOOPBACK = os.getenv('METRICS_ALLOW_LOOPBACK', 'False').lower() == 'true'
+
+# Percentiles reported alongside min/median/max, and whether listings outside
+# the 1.5 x IQR fences are ignored when suggesting a price.
+PRICE_STATS_PERCENTILES = tuple(
+    int(pct) for pct in os.getenv('PRICE_STATS_PERCENTILES', '10,25,75,90').split(',') if pct
+)
+PRICE_STATS_TRIM_OUTLIERS = os.getenv('PRICE_STATS_TRIM_OUTLIERS', 'False').lower() == 'true'
+
+# Price history keeps hourly buckets this many days, then daily buckets this
+# many days, then weekly buckets (see `manage.py compact_price_snapshots`).
+PRICE_SNAPSHOT_HOURLY_DAYS = int(os.getenv('PRICE_SNAPSHOT_HOURLY_DAYS', '7'))
+PRICE_SNAPSHOT_DAILY_DAYS = int(os.getenv('PRICE_SNAPSHOT_DAILY_DAYS', '90'))
+
+# Uploads are downscaled and re-encoded before being sent to Vision.
+VISION_MAX_EDGE = int(os.getenv('VISION_MAX_EDGE', '1024'))
+VISION_IMAGE_FORMAT = os.getenv('VISION_IMAGE_FORMAT', 'JPEG')
+VISION_IMAGE_QUALITY = int(os.getenv('VISION_IMAGE_QUALITY', '85'))
+
+# Vision results are reused for byte-identical uploads.
+RECOGNITION_CACHE_MAX_ENTRIES = int(os.getenv('RECOGNITION_CACHE_MAX_ENTRIES', '10000'))
+RECOGNITION_CACHE_TTL_DAYS = int(os.getenv('RECOGNITION_CACHE_TTL_DAYS', '90'))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ProductImage, SearchResult, PriceSuggestion
+from .models import ProductImage, SearchResult, PriceSuggestion, SearchJob, RecognitionCacheEntry, PriceSnapshot
 
 
 @admin.register(ProductImage)
@@ -20,3 +20,22 @@ class SearchResultAdmin(admin.ModelAdmin):
 class PriceSuggestionAdmin(admin.ModelAdmin):
     list_display = ['product_image', 'suggested_price', 'min_price', 'max_price', 'total_listings']
     list_filter = ['created_at']
+
+
+@admin.register(SearchJob)
+class SearchJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'product_image', 'status', 'attempts', 'worker', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+
+
+@admin.register(RecognitionCacheEntry)
+class RecognitionCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'primary_label', 'hits', 'created_at', 'last_used_at']
+    search_fields = ['content_hash', 'primary_label']
+
+
+@admin.register(PriceSnapshot)
+class PriceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['keyword', 'resolution', 'bucket_start', 'samples', 'listings', 'median_cents']
+    list_filter = ['resolution']
+    search_fields = ['keyword']
@@ -5,3 +5,12 @@ class FinderConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'finder'
     verbose_name = 'eBay Product Finder'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .db import configure_sqlite
+        from .timing import install_query_timer
+
+        connection_created.connect(configure_sqlite, dispatch_uid='finder.db.configure_sqlite')
+        connection_created.connect(install_query_timer, dispatch_uid='finder.timing.install_query_timer')
@@ -0,0 +1,636 @@
+"""
+Benchmarks for the search, pricing and persistence hot paths.
+
+Run them with ``python manage.py benchmark <suite>``. Suites that write to
+the database create their own ``ProductImage`` rows and delete them again.
+``--save`` writes the rows as a JSON baseline and ``--compare`` checks a
+run against one (see ``compare``).
+"""
+import io
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+import uuid
+import zlib
+from decimal import Decimal
+from typing import Callable, Optional
+
+from .listings import Listing
+from .models import PriceSuggestion, ProductImage, SearchResult
+from .services import PriceSuggestionService
+
+SUITES: dict[str, dict] = {}
+
+
+def suite(name: str, sizes: tuple[int, ...]):
+    """Register a benchmark suite with its default input sizes."""
+    def register(func: Callable) -> Callable:
+        SUITES[name] = {'func': func, 'sizes': sizes}
+        return func
+    return register
+
+
+def make_listings(count: int, seed: int = 0) -> list[Listing]:
+    """Build ``count`` synthetic parsed listings like ``_parse_items`` returns."""
+    rng = random.Random(seed)
+    conditions = ["New", "New", "Used", "Like New", "Certified - Refurbished", "For parts or not working"]
+    return [
+        Listing(
+            item_id="",
+            title=f"Synthetic listing {i} - Mobil 1 Synthetic Motor Oil 5W-30",
+            description="Synthetic benchmark listing with standard features.",
+            price_cents=round(rng.uniform(5, 500) * 100),
+            currency="USD",
+            seller=f"seller_{rng.randrange(500)}",
+            item_url=f"https://www.ebay.com/itm/{100000000 + i}",
+            image_url="",
+            condition=rng.choice(conditions),
+        )
+        for i in range(count)
+    ]
+
+
+RAW_CONDITIONS = [
+    ('New', '1000'),
+    ('New other (see details)', '1500'),
+    ('Certified - Refurbished', '2000'),
+    ('Seller refurbished', '2500'),
+    ('Used', '3000'),
+    ('For parts or not working', '7000'),
+]
+RAW_ADJECTIVES = ['Genuine', 'Premium', 'Original', 'Sealed', 'Bulk', 'OEM', 'Lot of 2', 'Fast Ship']
+
+
+def make_raw_item(query: str, index: int) -> dict:
+    """A listing shaped (and sized) like a Browse API itemSummary."""
+    rng = random.Random(f"{query}|{index}")
+    item_id = f"v1|{rng.randrange(10**11, 10**12)}|0"
+    condition, condition_id = rng.choice(RAW_CONDITIONS)
+    base = 10 + (zlib.crc32(query.encode()) % 190)
+    price = round(base * rng.uniform(0.6, 1.6), 2)
+    title = f"{rng.choice(RAW_ADJECTIVES)} {query.title()} {rng.choice(['Pro', 'Max', 'Mini', 'Plus', ''])} #{index}".strip()
+    image = f"https://i.ebayimg.com/images/g/{uuid.UUID(int=rng.getrandbits(128)).hex[:16]}/s-l225.jpg"
+    return {
+        'itemId': item_id,
+        'title': title,
+        'leafCategoryIds': [str(rng.randrange(100, 99999))],
+        'categories': [
+            {'categoryId': str(rng.randrange(100, 99999)), 'categoryName': 'Everything Else'},
+        ],
+        'image': {'imageUrl': image},
+        'price': {'value': f"{price:.2f}", 'currency': 'USD'},
+        'itemHref': f"https://api.ebay.com/buy/browse/v1/item/{item_id}",
+        'seller': {
+            'username': f"seller_{rng.randrange(10**6)}",
+            'feedbackPercentage': f"{rng.uniform(95, 100):.1f}",
+            'feedbackScore': rng.randrange(10, 50000),
+        },
+        'condition': condition,
+        'conditionId': condition_id,
+        'thumbnailImages': [{'imageUrl': image.replace('s-l225', 's-l1600')}],
+        'shippingOptions': [{
+            'shippingCostType': 'FIXED',
+            'shippingCost': {'value': f"{rng.choice([0, 4.99, 7.5]):.2f}", 'currency': 'USD'},
+        }],
+        'buyingOptions': ['FIXED_PRICE'],
+        'itemWebUrl': f"https://www.ebay.com/itm/{item_id.split('|')[1]}",
+        'itemLocation': {'postalCode': f"{rng.randrange(100, 999)}**", 'country': 'US'},
+        'shortDescription': f"{title}. Ships within one business day; see photos for details.",
+        'adultOnly': False,
+        'legacyItemId': item_id.split('|')[1],
+        'availableCoupons': False,
+        'itemCreationDate': '2024-01-01T00:00:00.000Z',
+        'topRatedBuyingExperience': rng.random() < 0.3,
+        'priorityListing': rng.random() < 0.2,
+        'listingMarketplaceId': 'EBAY_US',
+    }
+
+
+def make_payload(count: int, query: str = "mobil 1 synthetic oil") -> list[dict]:
+    """``count`` raw Browse API itemSummaries, as ``_parse_items`` receives them."""
+    return [make_raw_item(query, index) for index in range(count)]
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    """Return the fastest wall-clock time of ``repeat`` runs of ``func``."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def result(
+    name: str, size: int, seconds: float, unit: str = 'items/s', count: Optional[int] = None, **extra
+) -> dict:
+    """Build a result row; ``rate`` is ``count`` (default ``size``) per second."""
+    count = size if count is None else count
+    return {
+        'name': name,
+        'size': size,
+        'seconds': seconds,
+        'rate': count / seconds if seconds else 0.0,
+        'unit': unit,
+        'extra': extra,
+    }
+
+
+def save_results(path: str, rows: list[dict]) -> None:
+    """Write benchmark rows plus the environment they were measured in."""
+    import django
+
+    from . import price_stats
+
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump({
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'numpy': getattr(price_stats.np, '__version__', None),
+            'machine': platform.machine(),
+            'rows': rows,
+        }, fh, indent=2)
+
+
+def load_results(path: str) -> list[dict]:
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)['rows']
+
+
+def compare(
+    baseline: list[dict], current: list[dict], threshold: float = 0.10, min_seconds: float = 0.0005
+) -> list[dict]:
+    """
+    Match rows on ``(name, size)`` and report the relative change in time.
+
+    A row regresses when it is more than ``threshold`` slower than the
+    baseline and the absolute difference exceeds ``min_seconds`` (so timer
+    noise on microsecond cases is not reported).
+    """
+    before = {(row['name'], row['size']): row for row in baseline}
+    report = []
+    for row in current:
+        old = before.get((row['name'], row['size']))
+        if old is None or not old['seconds']:
+            continue
+        change = row['seconds'] / old['seconds'] - 1
+        report.append({
+            'name': row['name'],
+            'size': row['size'],
+            'baseline': old['seconds'],
+            'current': row['seconds'],
+            'change': change,
+            'regressed': change > threshold and row['seconds'] - old['seconds'] > min_seconds,
+        })
+    return report
+
+
+def _store_results_per_row(product_image: ProductImage, results: list[Listing]) -> None:
+    """The original one-INSERT-per-listing persistence loop, kept as a baseline."""
+    prices = []
+    for item in results:
+        SearchResult.objects.create(
+            product_image=product_image,
+            title=item.title,
+            price=item.price,
+            currency=item.currency,
+            seller_name=item.seller,
+            item_url=item.item_url,
+            image_url=item.image_url,
+            condition=item.condition,
+            description=item.description,
+        )
+        prices.append(item.price)
+    if prices:
+        PriceSuggestion.objects.create(
+            product_image=product_image,
+            **PriceSuggestionService.calculate_suggestion(prices)
+        )
+
+
+def _time_persist(store: Callable, listings: list[Listing], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        product_image = ProductImage.objects.create(detected_label="benchmark")
+        try:
+            started = time.perf_counter()
+            store(product_image, listings)
+            timings.append(time.perf_counter() - started)
+        finally:
+            product_image.delete()
+    return min(timings)
+
+
+@suite('persistence', sizes=(10, 200, 2000))
+def bench_persistence(sizes, repeat, options):
+    from .views import _store_results
+
+    rows = []
+    for size in sizes:
+        listings = make_listings(size)
+        for name, store in (('per_row', _store_results_per_row), ('bulk', _store_results)):
+            seconds = _time_persist(store, listings, repeat)
+            rows.append(result(f'persistence.{name}', size, seconds, unit='rows/s'))
+    return rows
+
+
+CONCURRENCY_LABEL = "benchmark concurrency"
+
+
+def _concurrent_writer(task: tuple[int, int, int]) -> tuple[int, int]:
+    """Run in a worker process: store ``batches`` searches of ``per_batch`` listings."""
+    from django.db import OperationalError, connections
+
+    from .views import _store_results
+
+    batches, per_batch, seed = task
+    listings = make_listings(per_batch, seed=seed)
+    written = errors = 0
+    try:
+        for _ in range(batches):
+            try:
+                product_image = ProductImage.objects.create(detected_label=CONCURRENCY_LABEL)
+                _store_results(product_image, listings, keywords=CONCURRENCY_LABEL)
+                written += per_batch
+            except OperationalError:
+                errors += 1
+    finally:
+        connections.close_all()
+    return written, errors
+
+
+@suite('concurrency', sizes=(1, 2, 4, 8))
+def bench_concurrency(sizes, repeat, options):
+    """
+    Write throughput of ``_store_results`` with ``size`` worker processes
+    saving searches at once, as concurrent ``_perform_search`` calls do.
+    Each worker stores 20 searches of 50 listings; failed (locked) writes
+    are reported as ``errors``. Run with ``SQLITE_JOURNAL_MODE=DELETE`` (or against
+    PostgreSQL) to compare database profiles.
+    """
+    import multiprocessing
+
+    from django.db import connection, connections
+
+    from .models import PriceSnapshot
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            profile = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+    else:
+        profile = connection.vendor
+    context = multiprocessing.get_context('fork')
+
+    rows = []
+    for size in sizes:
+        best = None
+        for _ in range(repeat):
+            # Children must open their own connections, not inherit ours.
+            connections.close_all()
+            with context.Pool(size) as pool:
+                started = time.perf_counter()
+                outcomes = pool.map(_concurrent_writer, [(20, 50, seed) for seed in range(size)])
+                seconds = time.perf_counter() - started
+            written = sum(outcome[0] for outcome in outcomes)
+            errors = sum(outcome[1] for outcome in outcomes)
+            if best is None or seconds < best[0]:
+                best = (seconds, written, errors)
+            ProductImage.objects.filter(detected_label=CONCURRENCY_LABEL).delete()
+            PriceSnapshot.objects.filter(keyword=CONCURRENCY_LABEL).delete()
+
+        seconds, written, errors = best
+        rows.append(result(
+            'concurrency.store_results', size, seconds, unit='rows/s', count=written,
+            errors=errors, db=profile,
+        ))
+    return rows
+
+
+@suite('price_index', sizes=(1000, 10000, 100000))
+def bench_price_index(sizes, repeat, options):
+    """
+    ``local_estimate`` over ``size`` stored listings: a query every listing
+    matches (capped at ``LOCAL_ESTIMATE_MAX_MATCHES``) and one that matches
+    a single listing.
+    """
+    from .price_index import local_estimate
+    from .views import _store_results
+
+    rows = []
+    for size in sizes:
+        product_image = ProductImage.objects.create(detected_label="benchmark")
+        try:
+            _store_results(product_image, make_listings(size))
+            for name, keywords in (('common', "mobil synthetic motor oil"), ('rare', f"listing {size // 2}")):
+                estimate = local_estimate(keywords)
+                seconds = best_of(lambda: local_estimate(keywords), repeat)
+                rows.append(result(
+                    f'price_index.local_estimate.{name}', size, seconds, unit='estimates/s', count=1,
+                    matches=estimate['matches'],
+                ))
+        finally:
+            product_image.delete()
+    return rows
+
+
+def make_photo(edge: int, seed: int = 0, orientation: int = 6) -> bytes:
+    """Build a camera-like JPEG (long edge ``edge``, 4:3) with an EXIF orientation."""
+    from PIL import Image, ImageFilter
+
+    width, height = edge, edge * 3 // 4
+    rng = random.Random(seed)
+    img = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    noise = Image.effect_noise((width, height), 40).convert('RGB')
+    img = Image.blend(img, noise, 0.3).filter(ImageFilter.GaussianBlur(1))
+    img = Image.blend(img, Image.new('RGB', img.size, tuple(rng.randrange(256) for _ in range(3))), 0.25)
+
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+@suite('imaging', sizes=(1024, 2048, 4032))
+def bench_imaging(sizes, repeat, options):
+    """
+    Compare the raw upload with the pre-processed Vision payload.
+
+    ``--corpus DIR`` benchmarks real photos (reported under size 0); otherwise
+    synthetic camera-sized JPEGs with the given long-edge sizes are used. The
+    request estimate assumes ``--uplink-mbps`` upstream bandwidth.
+    """
+    from .imaging import prepare_for_vision
+
+    uplink = options.get('uplink_mbps') or 20.0
+
+    corpus = options.get('corpus')
+    if corpus:
+        paths = [
+            os.path.join(corpus, name) for name in sorted(os.listdir(corpus))
+            if name.lower().endswith(('.jpg', '.jpeg', '.png', '.webp', '.gif'))
+        ]
+        cases = [(0, paths)]
+        workdir = None
+    else:
+        workdir = tempfile.mkdtemp(prefix='bench-imaging-')
+        cases = []
+        for edge in sizes:
+            path = os.path.join(workdir, f'photo_{edge}.jpg')
+            with open(path, 'wb') as fh:
+                fh.write(make_photo(edge))
+            cases.append((edge, [path]))
+
+    rows = []
+    try:
+        for size, paths in cases:
+            if not paths:
+                continue
+            raw_bytes = sum(os.path.getsize(path) for path in paths)
+            payloads = []
+            seconds = best_of(lambda: payloads.append([prepare_for_vision(p) for p in paths]), repeat)
+            out_bytes = sum(len(payload) for payload in payloads[-1])
+
+            raw_upload = raw_bytes * 8 / (uplink * 1_000_000)
+            out_upload = out_bytes * 8 / (uplink * 1_000_000)
+            rows.append(result(
+                'imaging.prepare_for_vision', size, seconds, unit='images/s', count=len(paths),
+                raw_kb=round(raw_bytes / 1024),
+                payload_kb=round(out_bytes / 1024),
+                est_raw_ms=round(raw_upload * 1000),
+                est_processed_ms=round((seconds + out_upload) * 1000),
+            ))
+    finally:
+        if workdir:
+            for name in os.listdir(workdir):
+                os.unlink(os.path.join(workdir, name))
+            os.rmdir(workdir)
+    return rows
+
+
+def _legacy_calculate_suggestion(prices: list[Decimal]) -> dict:
+    """The original float/statistics-module implementation, kept as a baseline."""
+    import statistics
+
+    float_prices = [float(p) for p in prices]
+    min_price = min(float_prices)
+    max_price = max(float_prices)
+    average_price = statistics.mean(float_prices)
+    median_price = statistics.median(float_prices)
+    suggested = min(max(median_price * 0.95, min_price), max_price * 0.9)
+    return {
+        "min_price": Decimal(str(round(min_price, 2))),
+        "max_price": Decimal(str(round(max_price, 2))),
+        "average_price": Decimal(str(round(average_price, 2))),
+        "median_price": Decimal(str(round(median_price, 2))),
+        "suggested_price": Decimal(str(round(suggested, 2))),
+        "total_listings": len(prices),
+    }
+
+
+@suite('stats', sizes=(10, 1000, 100000))
+def bench_stats(sizes, repeat, options):
+    from . import price_stats
+
+    backends = ['python'] + (['numpy'] if price_stats.np is not None else [])
+    rows = []
+    for size in sizes:
+        listings = make_listings(size)
+        prices = [item.price for item in listings]
+        conditions = [item.condition for item in listings]
+        cents = [price_stats.to_cents(price) for price in prices]
+
+        seconds = best_of(lambda: _legacy_calculate_suggestion(prices), repeat)
+        rows.append(result('stats.legacy', size, seconds, unit='prices/s'))
+        seconds = best_of(lambda: PriceSuggestionService.calculate_suggestion(prices), repeat)
+        rows.append(result('stats.calculate_suggestion', size, seconds, unit='prices/s'))
+        for backend in backends:
+            seconds = best_of(lambda: price_stats.summarize(prices, backend=backend), repeat)
+            rows.append(result(f'stats.summarize.{backend}', size, seconds, unit='prices/s'))
+            seconds = best_of(lambda: price_stats.summarize_cents(cents, backend=backend), repeat)
+            rows.append(result(f'stats.summarize_cents.{backend}', size, seconds, unit='prices/s'))
+            seconds = best_of(
+                lambda: price_stats.summarize(
+                    prices, percentiles=(10, 25, 75, 90), trim_outliers=True,
+                    conditions=conditions, backend=backend,
+                ),
+                repeat,
+            )
+            rows.append(result(f'stats.summarize_full.{backend}', size, seconds, unit='prices/s'))
+    return rows
+
+
+def _legacy_parse_items(items: list) -> list[dict]:
+    """The original dict-per-listing parser with eager Decimal prices, kept as a baseline."""
+    results = []
+    for item in items:
+        price_info = item.get("price", {})
+        results.append({
+            "item_id": item.get("itemId", ""),
+            "title": item.get("title", ""),
+            "description": item.get("shortDescription", ""),
+            "price": Decimal(price_info.get("value", "0")),
+            "currency": price_info.get("currency", "USD"),
+            "seller": item.get("seller", {}).get("username", ""),
+            "item_url": item.get("itemWebUrl", ""),
+            "image_url": item.get("image", {}).get("imageUrl", ""),
+            "condition": item.get("condition", ""),
+        })
+    return results
+
+
+def _retained_bytes(build: Callable[[], list]) -> int:
+    """Bytes still allocated by ``build()``'s result, excluding the strings it shares with its input."""
+    tracemalloc.start()
+    try:
+        kept = build()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return current
+
+
+@suite('parse', sizes=(10, 1000, 100000))
+def bench_parse(sizes, repeat, options):
+    """
+    Decode a Browse API JSON body and run ``_parse_items`` over it, then
+    parse already-decoded items into ``Listing`` records and into the
+    original dicts, with the memory each result set holds.
+    """
+    from .services import EbayAPIService
+
+    service = EbayAPIService()
+    rows = []
+    for size in sizes:
+        body = json.dumps({'total': size, 'itemSummaries': make_payload(size)})
+        seconds = best_of(lambda: service._parse_items(json.loads(body)['itemSummaries']), repeat)
+        rows.append(result('parse.parse_items', size, seconds, unit='items/s', body_kb=len(body) // 1024))
+
+        items = json.loads(body)['itemSummaries']
+        for name, parse in (('legacy_dicts', _legacy_parse_items), ('listings', service._parse_items)):
+            seconds = best_of(lambda: parse(items), repeat)
+            retained = _retained_bytes(lambda: parse(items))
+            rows.append(result(
+                f'parse.{name}', size, seconds, unit='items/s', bytes_per_item=retained // size,
+            ))
+
+        seconds = best_of(lambda: _legacy_api_search(items), repeat)
+        rows.append(result('parse.api_search.legacy_dicts', size, seconds, unit='items/s'))
+        seconds = best_of(lambda: _api_search(service, items), repeat)
+        rows.append(result('parse.api_search.listings', size, seconds, unit='items/s'))
+    return rows
+
+
+def _legacy_api_search(items: list) -> dict:
+    """What ``api_search`` did with the dict listings: Decimal statistics and payload copies."""
+    from .views import _suggestion_payload
+
+    results = _legacy_parse_items(items)
+    prices = [r['price'] for r in results]
+    return {
+        'results': [
+            {
+                'title': r['title'],
+                'description': r.get('description', ''),
+                'price': float(r['price']),
+                'currency': r['currency'],
+                'seller': r['seller'],
+                'url': r['item_url'],
+                'condition': r['condition'],
+            }
+            for r in results
+        ],
+        'suggestion': _suggestion_payload(PriceSuggestionService.summarize(prices), len(prices)),
+    }
+
+
+def _api_search(service, items: list) -> dict:
+    from .views import _result_payload, _suggestion_payload
+
+    results = service._parse_items(items)
+    cents = [r.price_cents for r in results]
+    return {
+        'results': [_result_payload(r) for r in results],
+        'suggestion': _suggestion_payload(PriceSuggestionService.summarize_cents(cents), len(cents)),
+    }
+
+
+@suite('render', sizes=(10, 1000, 10000))
+def bench_render(sizes, repeat, options):
+    """
+    Render ``finder/results.html`` with ``size`` listings on the page.
+
+    The view pages results, so real pages hold ``PAGE_SIZE`` rows; larger
+    sizes measure the per-row template cost.
+    """
+    from django.contrib.auth.models import AnonymousUser
+    from django.template.loader import render_to_string
+    from django.test import RequestFactory
+
+    from .search_results import build_search_rows
+
+    request = RequestFactory().get('/results/1/')
+    request.user = AnonymousUser()
+    product_image = ProductImage(pk=1, detected_label="benchmark")
+
+    rows = []
+    for size in sizes:
+        search_results, suggestion = build_search_rows(product_image, make_listings(size))
+        counts = {'total': size}
+        for item in search_results:
+            counts[item.condition_bucket] = counts.get(item.condition_bucket, 0) + 1
+        context = {
+            'product_image': product_image,
+            'search_results': search_results,
+            'next_cursor': None,
+            'condition_counts': counts,
+            'price_suggestion': suggestion,
+        }
+        seconds = best_of(lambda: render_to_string('finder/results.html', context, request=request), repeat)
+        rows.append(result('render.results', size, seconds, unit='rows/s'))
+    return rows
+
+
+@suite('timing', sizes=(1000, 100000))
+def bench_timing(sizes, repeat, options):
+    """
+    Cost of the request phase instrumentation: a timed call with and
+    without a request in progress, and an ORM query with the wrapper active.
+    """
+    from django.db import connection
+
+    from .timing import end_request, start_request, timed
+
+    @timed('bench')
+    def instrumented():
+        pass
+
+    def calls(count):
+        for _ in range(count):
+            instrumented()
+
+    def queries(count):
+        with connection.cursor() as cursor:
+            for _ in range(count):
+                cursor.execute("SELECT 1")
+
+    rows = []
+    for size in sizes:
+        rows.append(result('timing.phase.idle', size, best_of(lambda: calls(size), repeat), unit='calls/s'))
+        _, token = start_request()
+        try:
+            seconds = best_of(lambda: calls(size), repeat)
+            rows.append(result('timing.phase.in_request', size, seconds, unit='calls/s'))
+            seconds = best_of(lambda: queries(size), repeat)
+            rows.append(result('timing.query.in_request', size, seconds, unit='queries/s'))
+        finally:
+            end_request(token)
+        seconds = best_of(lambda: queries(size), repeat)
+        rows.append(result('timing.query.idle', size, seconds, unit='queries/s'))
+    return rows
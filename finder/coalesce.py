@@ -0,0 +1,89 @@
+"""
+Request coalescing ("single flight") for upstream eBay calls.
+
+Within a process, concurrent callers asking for the same key share one
+call: the first becomes the leader and runs it, the rest block until it
+finishes and receive the same result (or exception). Across processes a
+row in the ``SearchLock`` table marks a key as being fetched; callers in
+other processes wait for the leader's result to show up in the shared
+cache instead of calling eBay themselves.
+"""
+import os
+import socket
+import threading
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .metrics import Counters
+from .models import SearchLock
+
+
+class _Call:
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its outcome."""
+
+    def __init__(self, stats: Optional[Counters] = None) -> None:
+        self._calls: dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = stats if stats is not None else Counters()
+
+    def do(self, key: str, fn: Callable):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self.stats.incr('coalesced')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        self.stats.incr('flights')
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def acquire_lock(key: str, ttl: float) -> bool:
+    """Claim ``key`` for this caller unless another live owner holds it."""
+    now = timezone.now()
+    SearchLock.objects.filter(key=key, expires_at__lte=now).delete()
+    try:
+        with transaction.atomic():
+            SearchLock.objects.create(key=key, owner=_owner(), expires_at=now + timedelta(seconds=ttl))
+        return True
+    except IntegrityError:
+        return False
+
+
+def release_lock(key: str) -> None:
+    SearchLock.objects.filter(key=key, owner=_owner()).delete()
+
+
+def is_locked(key: str) -> bool:
+    return SearchLock.objects.filter(key=key, expires_at__gt=timezone.now()).exists()
@@ -0,0 +1,66 @@
+"""
+Database connection tuning and read-replica routing.
+
+SQLite connections get the ``SQLITE_*`` pragmas from settings as they are
+opened: WAL lets readers proceed while one writer commits, and with
+``synchronous=NORMAL`` a commit no longer waits for an fsync of the main
+database file.
+
+With a ``replica`` database configured, views decorated with
+``use_replica`` read this app's models from it. Everything else, including
+sessions and auth and any read inside a write path, stays on ``default``,
+so a user never reads from a replica that has not caught up with their own
+write. Pages a write redirects to (``product_detail``, ``results``) and
+views that load what an upload or job has just stored (``api_trend``) are
+deliberately not marked.
+"""
+import functools
+from contextvars import ContextVar
+
+from django.conf import settings
+
+REPLICA_ALIAS = 'replica'
+
+_use_replica: ContextVar[bool] = ContextVar('finder_use_replica', default=False)
+
+
+def configure_sqlite(sender, connection, **kwargs) -> None:
+    """``connection_created`` receiver applying the SQLite pragmas from settings."""
+    if connection.vendor != 'sqlite':
+        return
+    db = connection.connection
+    db.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    db.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT * 1000)}")
+    db.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    db.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+
+
+def use_replica(view):
+    """Let ``view`` read this app's models from the replica, when one is configured."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = _use_replica.set(True)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Route reads inside ``use_replica`` views to ``REPLICA_ALIAS``; all else to ``default``."""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and model._meta.app_label == 'finder':
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
@@ -0,0 +1,102 @@
+"""
+Image pre-processing applied before sending uploads to Cloud Vision.
+"""
+import hashlib
+import io
+from typing import Optional
+
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# EXIF tag holding the camera orientation.
+ORIENTATION_TAG = 0x0112
+
+
+def prepare_for_vision(
+    image_path: str,
+    max_edge: Optional[int] = None,
+    image_format: Optional[str] = None,
+    quality: Optional[int] = None,
+) -> bytes:
+    """
+    Return a compact, upright encoding of the image for annotation.
+
+    The file is decoded lazily (JPEGs are downscaled while decoding via
+    ``draft``), rotated according to its EXIF orientation, shrunk so its
+    longest edge is at most ``max_edge`` and re-encoded. Images that are
+    already small, upright and in a compact format are sent unchanged, as
+    are files Pillow cannot read.
+    """
+    max_edge = max_edge or settings.VISION_MAX_EDGE
+    image_format = (image_format or settings.VISION_IMAGE_FORMAT).upper()
+    quality = quality or settings.VISION_IMAGE_QUALITY
+
+    try:
+        with Image.open(image_path) as img:
+            orientation = img.getexif().get(ORIENTATION_TAG, 1)
+            if (
+                max(img.size) <= max_edge
+                and orientation == 1
+                and img.format in ('JPEG', 'WEBP')
+            ):
+                return _read_bytes(image_path)
+
+            if img.format == 'JPEG':
+                img.draft('RGB', (max_edge, max_edge))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            img = _flatten(img)
+
+            buffer = io.BytesIO()
+            img.save(buffer, format=image_format, quality=quality, optimize=True)
+            return buffer.getvalue()
+    except (UnidentifiedImageError, OSError, ValueError):
+        return _read_bytes(image_path)
+
+
+def content_hash(image_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of an image file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as image_file:
+        for chunk in iter(lambda: image_file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def prepare_file(
+    image_path: str, max_edge: int, image_format: str, quality: int
+) -> Optional[tuple[str, str, bytes]]:
+    """
+    Hash and pre-process one file, returning ``(image_path, content_hash, payload)``.
+
+    Returns ``None`` if the file is not a readable image. Takes every option
+    explicitly so it can run in a worker process that never configured Django
+    settings.
+    """
+    try:
+        with Image.open(image_path):
+            pass
+        return (
+            image_path,
+            content_hash(image_path),
+            prepare_for_vision(image_path, max_edge, image_format, quality),
+        )
+    except OSError:
+        return None
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    """Convert to RGB, compositing any transparency onto white."""
+    if img.mode == 'RGB':
+        return img
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        rgba = img.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+
+def _read_bytes(image_path: str) -> bytes:
+    with open(image_path, "rb") as image_file:
+        return image_file.read()
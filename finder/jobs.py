@@ -0,0 +1,124 @@
+"""
+Database-backed job queue for image recognition and eBay searches.
+
+Jobs are claimed with a conditional UPDATE, so any number of worker
+processes (``manage.py run_search_worker``) can share the queue. A claimed
+job is invisible to other workers until its ``locked_until`` passes; if the
+worker dies, the job becomes claimable again until ``max_attempts`` is used.
+Claims run one at a time behind a ``SearchLock`` row, so no two workers can
+both pass the ``SEARCH_JOB_MAX_RUNNING`` check.
+"""
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ProductImage, SearchJob, SearchLock
+from .ratelimit import RateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+# SearchLock row that serializes claims, so the SEARCH_JOB_MAX_RUNNING check
+# and the claim it allows cannot interleave across workers.
+CLAIM_LOCK_KEY = 'search-jobs:claim'
+
+
+def enqueue_search_job(product_image: ProductImage) -> SearchJob:
+    return SearchJob.objects.create(
+        product_image=product_image,
+        max_attempts=settings.SEARCH_JOB_MAX_ATTEMPTS,
+    )
+
+
+def _claimable(now) -> Q:
+    queued = Q(status=SearchJob.STATUS_QUEUED, available_at__lte=now)
+    expired = Q(
+        status=SearchJob.STATUS_RUNNING,
+        locked_until__lte=now,
+        attempts__lt=F('max_attempts'),
+    )
+    return queued | expired
+
+
+def fail_abandoned_jobs() -> int:
+    """Fail jobs whose worker vanished after their last allowed attempt."""
+    return SearchJob.objects.filter(
+        status=SearchJob.STATUS_RUNNING,
+        locked_until__lte=timezone.now(),
+        attempts__gte=F('max_attempts'),
+    ).update(
+        status=SearchJob.STATUS_FAILED,
+        error='Worker stopped responding before the job finished.',
+        finished_at=timezone.now(),
+    )
+
+
+def claim_job(worker_id: str, visibility_timeout: Optional[int] = None) -> Optional[SearchJob]:
+    """
+    Claim the oldest runnable job for ``worker_id``.
+
+    Returns ``None`` when nothing is runnable or when ``SEARCH_JOB_MAX_RUNNING``
+    jobs are already running across all workers.
+    """
+    timeout = visibility_timeout or settings.SEARCH_JOB_VISIBILITY_TIMEOUT
+
+    with transaction.atomic():
+        # Writing the lock row first takes a row lock on PostgreSQL and the
+        # database write lock on SQLite; other claimers wait here until we commit.
+        now = timezone.now()
+        if not SearchLock.objects.filter(key=CLAIM_LOCK_KEY).update(owner=worker_id, expires_at=now):
+            SearchLock.objects.get_or_create(
+                key=CLAIM_LOCK_KEY, defaults={'owner': worker_id, 'expires_at': now}
+            )
+            SearchLock.objects.filter(key=CLAIM_LOCK_KEY).update(owner=worker_id, expires_at=now)
+
+        running = SearchJob.objects.filter(
+            status=SearchJob.STATUS_RUNNING, locked_until__gt=now
+        ).count()
+        if running >= settings.SEARCH_JOB_MAX_RUNNING:
+            return None
+
+        candidates = (
+            SearchJob.objects.filter(_claimable(now))
+            .order_by('available_at', 'pk')
+            .values_list('pk', flat=True)[:10]
+        )
+        for pk in candidates:
+            claimed = SearchJob.objects.filter(_claimable(now), pk=pk).update(
+                status=SearchJob.STATUS_RUNNING,
+                locked_until=now + timedelta(seconds=timeout),
+                worker=worker_id,
+                attempts=F('attempts') + 1,
+            )
+            if claimed:
+                return SearchJob.objects.select_related('product_image').get(pk=pk)
+    return None
+
+
+def run_job(job: SearchJob) -> None:
+    """Run a claimed job and record its outcome."""
+    from .views import _recognize_and_search
+
+    owned = SearchJob.objects.filter(pk=job.pk, worker=job.worker, status=SearchJob.STATUS_RUNNING)
+    try:
+        _recognize_and_search(job.product_image)
+    except Exception as exc:
+        logger.exception("Search job %s failed on attempt %s", job.pk, job.attempts)
+        if job.attempts >= job.max_attempts:
+            owned.update(status=SearchJob.STATUS_FAILED, error=str(exc), finished_at=timezone.now())
+        else:
+            delay = settings.SEARCH_JOB_RETRY_DELAY * (2 ** (job.attempts - 1))
+            if isinstance(exc, RateLimitExceeded) and exc.retry_after:
+                delay = max(delay, exc.retry_after)
+            owned.update(
+                status=SearchJob.STATUS_QUEUED,
+                error=str(exc),
+                available_at=timezone.now() + timedelta(seconds=delay),
+                locked_until=None,
+            )
+    else:
+        owned.update(status=SearchJob.STATUS_DONE, error='', finished_at=timezone.now())
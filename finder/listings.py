@@ -0,0 +1,63 @@
+"""
+Compact in-memory listing records.
+
+Searches return ``Listing`` records rather than dicts. A ``Listing`` is a
+named tuple (no per-instance dict, fields read by index) and keeps the
+price as integer cents, which is what the price statistics work on anyway.
+``price`` builds a ``Decimal`` only when something at the edge asks for
+one, such as a ``SearchResult`` row.
+"""
+from decimal import Decimal
+from typing import NamedTuple
+
+from .price_stats import cents_to_decimal, to_cents
+
+_EMPTY: dict = {}
+_new = tuple.__new__
+
+
+class Listing(NamedTuple):
+    """One eBay listing as the app uses it."""
+
+    item_id: str
+    title: str
+    description: str
+    price_cents: int
+    currency: str
+    seller: str
+    item_url: str
+    image_url: str
+    condition: str
+
+    @property
+    def price(self) -> Decimal:
+        return cents_to_decimal(self.price_cents)
+
+
+def parse_summaries(items: list) -> list[Listing]:
+    """Pick the fields we use out of Browse API ``itemSummaries``."""
+    listings = []
+    append = listings.append
+    for item in items:
+        get = item.get
+        price = get('price') or _EMPTY
+        value = price.get('value', '0')
+        cents = float(value) * 100
+        price_cents = round(cents)
+        if abs(cents - price_cents) > 1e-6:
+            # More than two decimals: round half-up like everywhere else.
+            price_cents = to_cents(value)
+        # tuple.__new__ skips the generated keyword-handling constructor,
+        # which is most of the cost of building a record.
+        append(_new(Listing, (
+            get('itemId', ''),
+            get('title', ''),
+            get('shortDescription', ''),
+            price_cents,
+            price.get('currency', 'USD'),
+            (get('seller') or _EMPTY).get('username', ''),
+            get('itemWebUrl', ''),
+            (get('image') or _EMPTY).get('imageUrl', ''),
+            get('condition', ''),
+        )))
+    return listings
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from finder.benchmarks import SUITES, compare, load_results, save_results
+
+
+class Command(BaseCommand):
+    help = "Run performance benchmarks for the search, pricing and persistence paths."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'suites', nargs='*',
+            help=f"Suites to run (default: all). Available: {', '.join(sorted(SUITES))}",
+        )
+        parser.add_argument(
+            '--sizes', type=lambda value: [int(part) for part in value.split(',')],
+            help="Comma-separated input sizes overriding each suite's defaults.",
+        )
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per case; the best is reported.")
+        parser.add_argument('--corpus', help="Directory of sample photos for the imaging suite.")
+        parser.add_argument(
+            '--uplink-mbps', type=float, default=20.0,
+            help="Upload bandwidth assumed when estimating Vision request time.",
+        )
+        parser.add_argument('--save', help="Write the results to this JSON baseline file.")
+        parser.add_argument('--compare', help="Baseline JSON file to compare the results against.")
+        parser.add_argument(
+            '--threshold', type=float, default=0.10,
+            help="Relative slowdown against the baseline reported as a regression (default 0.10).",
+        )
+
+    def handle(self, *args, **options):
+        names = options['suites'] or sorted(SUITES)
+        unknown = [name for name in names if name not in SUITES]
+        if unknown:
+            raise CommandError(f"Unknown suite(s): {', '.join(unknown)}")
+
+        baseline = load_results(options['compare']) if options['compare'] else None
+
+        self.stdout.write(f"{'benchmark':<32} {'size':>8} {'time (ms)':>12} {'rate':>16}")
+        rows = []
+        for name in names:
+            spec = SUITES[name]
+            sizes = options['sizes'] or spec['sizes']
+            for row in spec['func'](sizes, max(options['repeat'], 1), options):
+                rows.append(row)
+                extra = " ".join(f"{key}={value}" for key, value in row['extra'].items())
+                self.stdout.write(
+                    f"{row['name']:<32} {row['size']:>8} {row['seconds'] * 1000:>12.2f} "
+                    f"{row['rate']:>10.0f} {row['unit']}  {extra}".rstrip()
+                )
+
+        if options['save']:
+            save_results(options['save'], rows)
+            self.stdout.write(f"Saved {len(rows)} result(s) to {options['save']}")
+        if baseline is not None:
+            report_comparison(self, compare(baseline, rows, options['threshold']), options['threshold'])
+
+
+def report_comparison(command: BaseCommand, report: list[dict], threshold: float) -> None:
+    """Print a baseline comparison and fail if any case regressed."""
+    command.stdout.write(f"\n{'benchmark':<32} {'size':>8} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+    for row in report:
+        line = (
+            f"{row['name']:<32} {row['size']:>8} {row['baseline'] * 1000:>12.2f} "
+            f"{row['current'] * 1000:>12.2f} {row['change']:>+8.1%}"
+        )
+        command.stdout.write(command.style.ERROR(line) if row['regressed'] else line)
+
+    regressed = [row for row in report if row['regressed']]
+    if regressed:
+        raise CommandError(f"{len(regressed)} case(s) regressed by more than {threshold:.0%}")
+    command.stdout.write(command.style.SUCCESS(f"No regressions beyond {threshold:.0%} in {len(report)} case(s)"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from finder.snapshots import downsample
+
+
+class Command(BaseCommand):
+    help = "Fold old hourly price snapshots into daily ones and old daily ones into weekly ones."
+
+    def handle(self, *args, **options):
+        folded = downsample()
+        self.stdout.write(self.style.SUCCESS(
+            f"Folded {folded.get('hour', 0)} hourly and {folded.get('day', 0)} daily snapshot(s)."
+        ))
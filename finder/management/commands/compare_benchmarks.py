@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from finder.benchmarks import compare, load_results
+
+from .benchmark import report_comparison
+
+
+class Command(BaseCommand):
+    help = "Compare two saved benchmark runs and fail if any case regressed beyond the threshold."
+
+    def add_arguments(self, parser):
+        parser.add_argument('baseline', help="JSON file saved with benchmark --save.")
+        parser.add_argument('current', help="JSON file to check against the baseline.")
+        parser.add_argument(
+            '--threshold', type=float, default=0.10,
+            help="Relative slowdown reported as a regression (default 0.10).",
+        )
+
+    def handle(self, *args, **options):
+        report = compare(load_results(options['baseline']), load_results(options['current']), options['threshold'])
+        report_comparison(self, report, options['threshold'])
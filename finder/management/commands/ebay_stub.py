@@ -0,0 +1,133 @@
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.management.base import BaseCommand
+
+from finder.benchmarks import make_raw_item
+
+TOKEN_PATH = '/identity/v1/oauth2/token'
+SEARCH_PATH = '/buy/browse/v1/item_summary/search'
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a local stand-in for eBay's OAuth token and item_summary/search endpoints, "
+        "with configurable latency, errors and 429s, for load testing without credentials."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=float, default=150.0, help="Median response latency.")
+        parser.add_argument('--jitter', type=float, default=0.3, help="Log-normal sigma applied to the latency.")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of searches answered with 500.")
+        parser.add_argument('--throttle-rate', type=float, default=0.0, help="Fraction of searches answered with 429.")
+        parser.add_argument(
+            '--max-rps', type=float, default=0.0,
+            help="Answer 429 once searches exceed this rate (0 for no limit).",
+        )
+        parser.add_argument('--total', type=int, default=5000, help="Matches reported per query.")
+
+    def handle(self, *args, **options):
+        stats = {'tokens': 0, 'searches': 0, 'errors': 0, 'throttled': 0}
+        lock = threading.Lock()
+        window = {'start': time.monotonic(), 'count': 0}
+
+        def over_rate() -> bool:
+            if not options['max_rps']:
+                return False
+            with lock:
+                now = time.monotonic()
+                if now - window['start'] >= 1.0:
+                    window['start'], window['count'] = now, 0
+                window['count'] += 1
+                return window['count'] > options['max_rps']
+
+        def delay():
+            time.sleep(options['latency_ms'] / 1000 * random.lognormvariate(0, options['jitter']))
+
+        def count(name):
+            with lock:
+                stats[name] += 1
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if urlsplit(self.path).path != TOKEN_PATH:
+                    return self.send_json(404, {'errors': [{'message': 'Not found'}]})
+                delay()
+                count('tokens')
+                self.send_json(200, {
+                    'access_token': f"stub-{uuid.uuid4().hex}",
+                    'expires_in': 7200,
+                    'token_type': 'Application Access Token',
+                })
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path != SEARCH_PATH:
+                    return self.send_json(404, {'errors': [{'message': 'Not found'}]})
+                if not self.headers.get('Authorization', '').startswith('Bearer '):
+                    return self.send_json(401, {'errors': [{'message': 'Invalid access token'}]})
+
+                if over_rate() or random.random() < options['throttle_rate']:
+                    count('throttled')
+                    return self.send_json(429, {'errors': [{'message': 'Too many requests'}]}, {'Retry-After': '1'})
+                delay()
+                if random.random() < options['error_rate']:
+                    count('errors')
+                    return self.send_json(500, {'errors': [{'message': 'Internal error'}]})
+
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                query = params.get('q', '')
+                limit = min(int(params.get('limit', 50)), 200)
+                offset = int(params.get('offset', 0))
+                total = options['total']
+                count('searches')
+                self.send_json(200, {
+                    'href': self.path,
+                    'total': total,
+                    'limit': limit,
+                    'offset': offset,
+                    'itemSummaries': [make_raw_item(query, index) for index in range(offset, min(offset + limit, total))],
+                })
+
+            def send_json(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        server.daemon_threads = True
+        base = f"http://{options['host']}:{options['port']}"
+        self.stdout.write(
+            f"eBay stub listening on {base}\n"
+            f"  EBAY_APP_ID=stub EBAY_CERT_ID=stub \\\n"
+            f"  EBAY_OAUTH_TOKEN_URL={base}{TOKEN_PATH} \\\n"
+            f"  EBAY_BROWSE_API_URL={base}/buy/browse/v1"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(
+                f"Served {stats['searches']} search(es), {stats['tokens']} token(s); "
+                f"{stats['errors']} error(s), {stats['throttled']} throttled"
+            )
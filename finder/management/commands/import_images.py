@@ -0,0 +1,183 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from finder.imaging import prepare_file
+from finder.listings import Listing
+from finder.models import PriceSuggestion, ProductImage, SearchResult, upload_to
+from finder.ratelimit import PRIORITY_BATCH, RateLimitExceeded
+from finder.services import EbayAPIService, ImageRecognitionService
+from finder.search_results import build_search_rows
+from finder.snapshots import record_snapshot
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-import product photos from a directory or manifest: dedupe, recognize "
+        "with batched Vision calls, search eBay and store price suggestions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            help="Directory to walk, or a manifest (.txt with one path per line, or .csv with a 'path' column).",
+        )
+        parser.add_argument('--batch-size', type=int, default=64, help="Images committed per batch.")
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 2,
+            help="Processes used for hashing and pre-processing.",
+        )
+        parser.add_argument('--search-concurrency', type=int, default=4, help="Parallel eBay searches.")
+        parser.add_argument(
+            '--checkpoint',
+            help="Checkpoint file (default: CACHE_DIR/import_images.<source>.json).",
+        )
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint.")
+
+    def handle(self, *args, **options):
+        source = Path(options['source'])
+        if not source.exists():
+            raise CommandError(f"{source} does not exist")
+
+        checkpoint_path = Path(
+            options['checkpoint']
+            or settings.CACHE_DIR / f"import_images.{source.resolve().name}.json"
+        )
+        checkpoint = {'paths': [], 'hashes': []}
+        if checkpoint_path.exists() and not options['restart']:
+            checkpoint = json.loads(checkpoint_path.read_text())
+        done_paths = set(checkpoint['paths'])
+        seen_hashes = set(checkpoint['hashes'])
+
+        paths = [path for path in self.collect_paths(source) if path not in done_paths]
+        self.stdout.write(
+            f"{len(paths)} image(s) to import"
+            + (f", {len(done_paths)} already done per {checkpoint_path}" if done_paths else "")
+        )
+
+        prepare = partial(
+            prepare_file,
+            max_edge=settings.VISION_MAX_EDGE,
+            image_format=settings.VISION_IMAGE_FORMAT,
+            quality=settings.VISION_IMAGE_QUALITY,
+        )
+        recognition_service = ImageRecognitionService()
+        totals = {'images': 0, 'duplicates': 0, 'unreadable': 0, 'listings': 0}
+        started = time.monotonic()
+
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1)) as process_pool, \
+                ThreadPoolExecutor(max_workers=max(options['search_concurrency'], 1)) as search_pool:
+            for start in range(0, len(paths), options['batch_size']):
+                batch = paths[start:start + options['batch_size']]
+
+                unique = []
+                for prepared in process_pool.map(prepare, batch):
+                    if prepared is None:
+                        totals['unreadable'] += 1
+                    elif prepared[1] in seen_hashes:
+                        totals['duplicates'] += 1
+                    else:
+                        seen_hashes.add(prepared[1])
+                        unique.append(prepared)
+
+                labels = recognition_service.recognize_batch(unique)
+                keywords = [web_label or primary for primary, _, web_label in labels]
+                try:
+                    search_results = list(search_pool.map(_search, keywords))
+                except RateLimitExceeded as exc:
+                    raise CommandError(
+                        f"{exc}; stopped after {len(done_paths)} file(s), rerun to resume"
+                    ) from exc
+
+                totals['listings'] += self.write_batch(unique, labels, keywords, search_results)
+                totals['images'] += len(unique)
+
+                done_paths.update(batch)
+                self.save_checkpoint(checkpoint_path, done_paths, seen_hashes)
+
+                elapsed = time.monotonic() - started
+                processed = start + len(batch)
+                self.stdout.write(
+                    f"{processed}/{len(paths)} files  {processed / elapsed:.1f} files/s  "
+                    f"{totals['images']} imported  {totals['duplicates']} duplicate(s)  "
+                    f"{totals['unreadable']} unreadable  {totals['listings']} listings"
+                )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['images']} image(s) and {totals['listings']} listings in {elapsed:.1f}s"
+        ))
+
+    def collect_paths(self, source: Path) -> list[str]:
+        if source.is_dir():
+            return sorted(
+                str(path) for path in source.rglob('*')
+                if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS
+            )
+
+        base = source.parent
+        if source.suffix.lower() == '.csv':
+            with open(source, newline='', encoding='utf-8') as fh:
+                entries = [row['path'] for row in csv.DictReader(fh) if row.get('path')]
+        else:
+            with open(source, encoding='utf-8') as fh:
+                entries = [line.strip() for line in fh if line.strip() and not line.startswith('#')]
+        return [str(path if path.is_absolute() else base / path) for path in map(Path, entries)]
+
+    def write_batch(self, images, labels, keywords, search_results) -> int:
+        # Files are not part of the transaction: delete the ones this batch
+        # saved if anything fails, so a rolled-back batch leaves no orphans.
+        saved = []
+        try:
+            product_images = []
+            for (path, _, _), (primary, detected_labels, _) in zip(images, labels):
+                with open(path, 'rb') as fh:
+                    name = default_storage.save(upload_to(None, os.path.basename(path)), File(fh))
+                saved.append(name)
+                product_images.append(ProductImage(
+                    image=name,
+                    detected_label=primary[:255],
+                    detected_labels=", ".join(detected_labels),
+                ))
+
+            rows, suggestions = [], []
+            with transaction.atomic():
+                ProductImage.objects.bulk_create(product_images)
+                for product_image, keyword, results in zip(product_images, keywords, search_results):
+                    image_rows, suggestion = build_search_rows(product_image, results)
+                    rows.extend(image_rows)
+                    if suggestion is not None:
+                        suggestions.append(suggestion)
+                        record_snapshot(keyword, image_rows)
+                SearchResult.objects.bulk_create(rows, batch_size=settings.SEARCH_RESULT_BATCH_SIZE)
+                PriceSuggestion.objects.bulk_create(suggestions)
+        except BaseException:
+            for name in saved:
+                default_storage.delete(name)
+            raise
+        return len(rows)
+
+    def save_checkpoint(self, path: Path, done_paths: set, seen_hashes: set) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(json.dumps({
+            'paths': sorted(done_paths),
+            'hashes': sorted(seen_hashes),
+        }))
+        os.replace(tmp_path, path)
+
+
+def _search(keywords: str) -> list[Listing]:
+    return EbayAPIService(priority=PRIORITY_BATCH).search_products(keywords)
@@ -0,0 +1,180 @@
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from finder.benchmarks import make_photo
+from finder.metrics import LatencyRecorder
+
+DEFAULT_KEYWORDS = [
+    'iphone 12', 'mobil 1 synthetic oil', 'castrol edge 5w-30', 'nintendo switch',
+    'canon eos r6', 'lego millennium falcon', 'air jordan 1', 'kitchenaid mixer',
+    'dyson v11', 'sony wh-1000xm4', 'garmin fenix 6', 'instant pot duo',
+]
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive manual_search, api_search and upload_image on a running server at a target "
+        "request rate and report latency percentiles and throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help="Server under test.")
+        parser.add_argument('--rps', type=float, default=10.0, help="Target requests per second.")
+        parser.add_argument('--duration', type=float, default=30.0, help="Seconds to generate load for.")
+        parser.add_argument('--concurrency', type=int, default=32, help="Maximum requests in flight.")
+        parser.add_argument(
+            '--mix', type=parse_mix, default=parse_mix('api_search=8,manual_search=1,upload_image=1'),
+            help="Weighted scenario mix, e.g. 'api_search=8,manual_search=1,upload_image=1'.",
+        )
+        parser.add_argument('--keywords', help="File with one search phrase per line.")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['mix']) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+        keywords = DEFAULT_KEYWORDS
+        if options['keywords']:
+            with open(options['keywords'], encoding='utf-8') as fh:
+                keywords = [line.strip() for line in fh if line.strip()]
+
+        base_url = options['base_url'].rstrip('/')
+        self.stdout.write(f"Logging in {options['concurrency']} guest session(s) at {base_url}")
+        sessions = queue.Queue()
+        try:
+            for _ in range(max(options['concurrency'], 1)):
+                sessions.put(guest_session(base_url, options['timeout']))
+        except requests.RequestException as exc:
+            raise CommandError(f"Could not log in at {base_url}: {exc}") from exc
+
+        context = {
+            'base_url': base_url,
+            'keywords': keywords,
+            'photo': make_photo(1024, orientation=1),
+            'timeout': options['timeout'],
+        }
+        names = list(options['mix'])
+        weights = [options['mix'][name] for name in names]
+        latency = LatencyRecorder(window=10 ** 6)
+        statuses: dict[str, Counter] = {name: Counter() for name in names}
+        lock = threading.Lock()
+
+        def run(name: str, due: float) -> None:
+            session = sessions.get()
+            try:
+                status = SCENARIOS[name](session, context)
+            except requests.RequestException as exc:
+                status = type(exc).__name__
+            finally:
+                sessions.put(session)
+            # Measured from the scheduled start so a slow server cannot hide
+            # queueing delay (no coordinated omission).
+            latency.record(name, time.perf_counter() - due)
+            with lock:
+                statuses[name][status] += 1
+
+        total = int(options['rps'] * options['duration'])
+        self.stdout.write(f"Sending {total} request(s) at {options['rps']:g} req/s for {options['duration']:g}s")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(options['concurrency'], 1)) as pool:
+            for index in range(total):
+                due = started + index / options['rps']
+                pause = due - time.perf_counter()
+                if pause > 0:
+                    time.sleep(pause)
+                pool.submit(run, random.choices(names, weights)[0], due)
+        elapsed = time.perf_counter() - started
+
+        self.report(latency.snapshot(), statuses, elapsed)
+
+    def report(self, latency: dict, statuses: dict, elapsed: float) -> None:
+        self.stdout.write(
+            f"\n{'scenario':<16} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'p99 ms':>9} {'max ms':>9}  statuses"
+        )
+        completed = 0
+        for name, counts in statuses.items():
+            row = latency.get(name)
+            if row is None:
+                continue
+            completed += row['count']
+            status_text = " ".join(f"{status}:{count}" for status, count in sorted(counts.items(), key=str))
+            self.stdout.write(
+                f"{name:<16} {row['count']:>9} {row['count'] / elapsed:>8.1f} {row['p50_ms']:>9.1f} "
+                f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}  {status_text}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{completed} request(s) in {elapsed:.1f}s: {completed / elapsed:.1f} req/s"
+        ))
+
+
+def guest_session(base_url: str, timeout: float) -> requests.Session:
+    """Log in as the guest user, the way the login page's button does."""
+    session = requests.Session()
+    session.get(f"{base_url}/accounts/login/", timeout=timeout).raise_for_status()
+    response = session.post(
+        f"{base_url}/accounts/guest/",
+        data={'csrfmiddlewaretoken': session.cookies.get('csrftoken', '')},
+        headers={'Referer': f"{base_url}/accounts/login/"},
+        allow_redirects=False,
+        timeout=timeout,
+    )
+    if response.status_code != 302:
+        raise requests.RequestException(f"guest login answered {response.status_code}")
+    return session
+
+
+def _post(session: requests.Session, context: dict, path: str, **kwargs) -> requests.Response:
+    data = dict(kwargs.pop('data', {}), csrfmiddlewaretoken=session.cookies.get('csrftoken', ''))
+    return session.post(
+        f"{context['base_url']}{path}",
+        data=data,
+        headers={'Referer': f"{context['base_url']}/", **kwargs.pop('headers', {})},
+        allow_redirects=False,
+        timeout=context['timeout'],
+        **kwargs,
+    )
+
+
+def api_search(session: requests.Session, context: dict):
+    response = session.get(
+        f"{context['base_url']}/api/search/",
+        params={'keywords': random.choice(context['keywords'])},
+        timeout=context['timeout'],
+    )
+    response.content
+    return response.status_code
+
+
+def manual_search(session: requests.Session, context: dict):
+    return _post(session, context, '/search/', data={'keywords': random.choice(context['keywords'])}).status_code
+
+
+def upload_image(session: requests.Session, context: dict):
+    return _post(
+        session, context, '/upload/',
+        files={'image': ('loadtest.jpg', context['photo'], 'image/jpeg')},
+        headers={'Accept': 'application/json'},
+    ).status_code
+
+
+SCENARIOS = {
+    'api_search': api_search,
+    'manual_search': manual_search,
+    'upload_image': upload_image,
+}
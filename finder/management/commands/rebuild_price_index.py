@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from finder.price_index import install, uninstall
+
+
+class Command(BaseCommand):
+    help = (
+        "Recreate the local full-text price index over stored search results "
+        "(needed after a migration rebuilds the finder_searchresult table on SQLite)."
+    )
+
+    def handle(self, *args, **options):
+        uninstall(connection)
+        if not install(connection):
+            raise CommandError(f"The {connection.vendor} database cannot host the full-text index.")
+        self.stdout.write(self.style.SUCCESS("Price index rebuilt."))
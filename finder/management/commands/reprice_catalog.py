@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from finder.listings import Listing
+from finder.models import ListingProduct, SearchResult, condition_bucket
+from finder.ratelimit import PRIORITY_BATCH, RateLimitExceeded
+from finder.search_cache import normalize_keywords
+from finder.services import EbayAPIService, PriceSuggestionService, is_demo_listing
+
+# The Browse API rejects queries longer than 100 characters.
+MAX_QUERY_LENGTH = 100
+
+LISTING_BUCKETS = {
+    ListingProduct.CONDITION_NEW: SearchResult.CONDITION_NEW,
+    ListingProduct.CONDITION_OPEN_BOX: SearchResult.CONDITION_NEW,
+    ListingProduct.CONDITION_USED: SearchResult.CONDITION_USED,
+    ListingProduct.CONDITION_REFURBISHED: SearchResult.CONDITION_REFURBISHED,
+}
+
+
+class RateBudget:
+    """Spread calls evenly so that at most ``rate`` start per second."""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(self._next, now) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare every ListingProduct with the live market: search eBay for its title "
+        "in its category and store a suggested price and the delta to our price."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Products loaded and saved per chunk.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Parallel eBay searches.")
+        parser.add_argument(
+            '--rate', type=float, default=5.0,
+            help=(
+                "Maximum eBay searches started per second by this run (0 for no limit); "
+                "the host-wide EBAY_RATE_LIMIT_* budget applies on top."
+            ),
+        )
+        parser.add_argument('--limit', type=int, default=50, help="Listings fetched per search.")
+        parser.add_argument(
+            '--stale-hours', type=float,
+            help="Only reprice products not repriced within this many hours.",
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help="Checkpoint file (default: CACHE_DIR/reprice_catalog.json).",
+        )
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint.")
+
+    def handle(self, *args, **options):
+        checkpoint_path = options['checkpoint'] or settings.CACHE_DIR / 'reprice_catalog.json'
+        last_pk = 0
+        if os.path.exists(checkpoint_path) and not options['restart']:
+            with open(checkpoint_path) as fh:
+                last_pk = json.load(fh)['last_pk']
+            self.stdout.write(f"Resuming after product {last_pk} per {checkpoint_path}")
+
+        products = ListingProduct.objects.order_by('pk')
+        if options['stale_hours'] is not None:
+            cutoff = timezone.now() - timedelta(hours=options['stale_hours'])
+            products = products.exclude(repriced_at__gte=cutoff)
+        remaining = products.filter(pk__gt=last_pk).count()
+        self.stdout.write(f"{remaining} product(s) to reprice")
+
+        service = EbayAPIService(priority=PRIORITY_BATCH)
+        if not service.app_id or not service.cert_id:
+            raise CommandError(
+                "EBAY_APP_ID and EBAY_CERT_ID must be set; without them searches only return demo data"
+            )
+        budget = RateBudget(options['rate'])
+        totals = {'products': 0, 'searches': 0, 'unpriced': 0}
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=max(options['concurrency'], 1)) as pool:
+            while True:
+                chunk = list(products.filter(pk__gt=last_pk)[:options['chunk_size']])
+                if not chunk:
+                    break
+
+                queries = {product.pk: self.query_for(product) for product in chunk}
+                unique = list(dict.fromkeys(queries.values()))
+
+                def search(query):
+                    budget.acquire()
+                    return service.search_products(query[0], limit=options['limit'], category_id=query[1])
+
+                try:
+                    listings = dict(zip(unique, pool.map(search, unique)))
+                except RateLimitExceeded as exc:
+                    raise CommandError(
+                        f"{exc}; stopped after product {last_pk}, rerun to resume"
+                    ) from exc
+                totals['searches'] += len(unique)
+
+                now = timezone.now()
+                for product in chunk:
+                    if not self.apply_suggestion(product, listings[queries[product.pk]], now):
+                        totals['unpriced'] += 1
+                ListingProduct.objects.bulk_update(
+                    chunk, ['suggested_price', 'price_delta', 'market_listings', 'repriced_at']
+                )
+
+                last_pk = chunk[-1].pk
+                self.save_checkpoint(checkpoint_path, last_pk)
+                totals['products'] += len(chunk)
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{totals['products']}/{remaining} products  "
+                    f"{totals['products'] / elapsed:.1f} products/s  "
+                    f"{totals['searches'] / elapsed:.1f} searches/s  "
+                    f"{totals['unpriced']} without market data"
+                )
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Repriced {totals['products']} product(s) with {totals['searches']} search(es) "
+            f"in {elapsed:.1f}s ({totals['products'] / elapsed if elapsed else 0:.1f} products/s)"
+        ))
+
+    def query_for(self, product: ListingProduct) -> tuple[str, str]:
+        return normalize_keywords(product.title)[:MAX_QUERY_LENGTH], product.category_id.strip()
+
+    def apply_suggestion(self, product: ListingProduct, listings: list[Listing], now) -> bool:
+        """
+        Price ``product`` against listings in its own condition bucket, falling
+        back to all listings when none match. Returns whether it was priced.
+
+        Demo listings (served when an eBay request fails) are not market data:
+        if that is all the search returned, ``product`` is left as it was so
+        the next run prices it again.
+        """
+        listings = [item for item in listings if not is_demo_listing(item.item_id)]
+        if not listings:
+            return False
+
+        bucket = LISTING_BUCKETS.get(product.condition)
+        cents = [item.price_cents for item in listings if condition_bucket(item.condition) == bucket]
+        if not cents:
+            cents = [item.price_cents for item in listings]
+
+        summary = PriceSuggestionService.summarize_cents(cents)
+        product.repriced_at = now
+        product.market_listings = len(cents)
+        if summary is None:
+            product.suggested_price = None
+            product.price_delta = None
+            return False
+        product.suggested_price = summary['suggested_price']
+        product.price_delta = product.price - summary['suggested_price']
+        return True
+
+    def save_checkpoint(self, path, last_pk: int) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as fh:
+            json.dump({'last_pk': last_pk}, fh)
+        os.replace(tmp_path, path)
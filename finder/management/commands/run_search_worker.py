@@ -0,0 +1,69 @@
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from finder.jobs import claim_job, fail_abandoned_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Process queued image recognition and search jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=2,
+            help="Jobs this process runs at once (SEARCH_JOB_MAX_RUNNING caps the global total).",
+        )
+        parser.add_argument(
+            '--visibility-timeout', type=int, default=settings.SEARCH_JOB_VISIBILITY_TIMEOUT,
+            help="Seconds a claimed job stays hidden from other workers.",
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stop = threading.Event()
+        worker_base = f"{socket.gethostname()}:{os.getpid()}"
+
+        threads = [
+            threading.Thread(target=self.work, args=(f"{worker_base}:{i}",), daemon=True)
+            for i in range(max(options['concurrency'], 1))
+        ]
+        self.stdout.write(f"Worker {worker_base} started with {len(threads)} thread(s).")
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping after running jobs finish...")
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+    def work(self, worker_id):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                fail_abandoned_jobs()
+                job = claim_job(worker_id, self.options['visibility_timeout'])
+                if job is None:
+                    if self.options['once']:
+                        return
+                    self.stop.wait(self.options['poll_interval'])
+                    continue
+
+                started = time.monotonic()
+                run_job(job)
+                job.refresh_from_db()
+                self.stdout.write(
+                    f"[{worker_id}] job {job.pk} {job.status} "
+                    f"(attempt {job.attempts}/{job.max_attempts}) in {time.monotonic() - started:.2f}s"
+                )
+        finally:
+            connection.close()
@@ -0,0 +1,153 @@
+"""
+Lightweight in-process timing metrics.
+
+Histograms register themselves by name and are rendered in the Prometheus
+text format by ``render_prometheus``. All metrics are per process: with
+several workers each scrape sees the process that answered it.
+"""
+import threading
+from bisect import bisect_left
+from collections import defaultdict, deque
+
+
+class LatencyRecorder:
+    """Keep a bounded window of latency samples per call name."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: dict[str, deque] = defaultdict(lambda: deque(maxlen=self.window))
+        self._counts: dict[str, int] = defaultdict(int)
+        self._totals: dict[str, float] = defaultdict(float)
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[name].append(seconds)
+            self._counts[name] += 1
+            self._totals[name] += seconds
+
+    def snapshot(self) -> dict:
+        """Return count, mean and recent percentiles (in ms) for every call name."""
+        with self._lock:
+            names = list(self._samples)
+            data = {
+                name: (sorted(self._samples[name]), self._counts[name], self._totals[name])
+                for name in names
+            }
+
+        summary = {}
+        for name, (samples, count, total) in data.items():
+            if not samples:
+                continue
+            summary[name] = {
+                'count': count,
+                'avg_ms': round(total / count * 1000, 2),
+                'p50_ms': round(_percentile(samples, 50) * 1000, 2),
+                'p95_ms': round(_percentile(samples, 95) * 1000, 2),
+                'p99_ms': round(_percentile(samples, 99) * 1000, 2),
+                'max_ms': round(samples[-1] * 1000, 2),
+            }
+        return summary
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._totals.clear()
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Counters:
+    """Thread-safe named counters."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: dict[str, int] = defaultdict(int)
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._values[name] += amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+# Seconds; suits both sub-millisecond ORM phases and multi-second eBay calls.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HISTOGRAMS: dict[str, 'Histogram'] = {}
+
+
+class Histogram:
+    """Cumulative bucket counts per combination of label values."""
+
+    def __init__(
+        self, name: str, help_text: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._series: dict[tuple, list] = {}
+        HISTOGRAMS[name] = self
+
+    def observe(self, seconds: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self) -> list[str]:
+        with self._lock:
+            data = {labels: list(series) for labels, series in self._series.items()}
+
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(data.items()):
+            pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket_labels = ','.join(pairs + [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{','.join(pairs)}}}" if pairs else ''
+            lines.append(f"{self.name}_sum{suffix} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+def counter_lines(name: str, help_text: str, label: str, values: dict) -> list[str]:
+    """Render a ``Counters`` snapshot as one Prometheus counter labelled by key."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    lines.extend(f'{name}{{{label}="{_escape(key)}"}} {value}' for key, value in sorted(values.items()))
+    return lines
+
+
+def render_prometheus(extra_lines: tuple[str, ...] = ()) -> str:
+    lines = []
+    for histogram in list(HISTOGRAMS.values()):
+        lines.extend(histogram.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
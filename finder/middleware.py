@@ -0,0 +1,32 @@
+from django.conf import settings
+
+from .timing import end_request, start_request
+
+
+class ServerTimingMiddleware:
+    """
+    Time each request by phase (see ``finder.timing``), record the phases in
+    the request histograms and, with ``SERVER_TIMING_HEADER``, report them to
+    the client in a ``Server-Timing`` header.
+
+    Listed first in ``MIDDLEWARE`` so the other middleware is included in the
+    total. For streaming responses only the work done before the first byte is
+    counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+
+        total = timer.finish()
+        match = request.resolver_match
+        timer.observe(match.view_name if match else 'unmatched', total)
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = timer.header(total)
+        return response
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0005_searchjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecognitionCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('primary_label', models.CharField(max_length=255)),
+                ('labels', models.JSONField(default=list)),
+                ('web_label', models.CharField(blank=True, max_length=255)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'recognition cache entries',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0006_recognitioncacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=255)),
+                ('resolution', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily'), ('week', 'Weekly')], default='hour', max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('listings', models.PositiveIntegerField(default=0)),
+                ('min_cents', models.IntegerField()),
+                ('max_cents', models.IntegerField()),
+                ('sum_cents', models.BigIntegerField()),
+                ('p25_cents', models.IntegerField()),
+                ('median_cents', models.IntegerField()),
+                ('p75_cents', models.IntegerField()),
+                ('suggested_cents', models.IntegerField()),
+            ],
+            options={
+                'ordering': ['keyword', 'bucket_start'],
+                'indexes': [models.Index(fields=['keyword', 'bucket_start'], name='finder_pric_keyword_524504_idx'), models.Index(fields=['resolution', 'bucket_start'], name='finder_pric_resolut_e1dcb9_idx')],
+                'constraints': [models.UniqueConstraint(fields=('keyword', 'resolution', 'bucket_start'), name='unique_price_snapshot_bucket')],
+            },
+        ),
+    ]
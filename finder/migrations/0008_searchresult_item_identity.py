@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0007_pricesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchresult',
+            name='ended_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='searchresult',
+            name='item_id',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='searchresult',
+            index=models.Index(fields=['product_image', 'item_id'], name='finder_sear_product_4339c4_idx'),
+        ),
+    ]
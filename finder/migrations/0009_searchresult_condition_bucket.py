@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:24
+
+from django.db import migrations, models
+
+
+def condition_bucket(condition):
+    # A frozen copy of finder.models.condition_bucket as of this migration,
+    # so later changes to the mapping do not rewrite the backfill.
+    text = (condition or '').lower()
+    if not text:
+        return 'other'
+    if 'refurb' in text:
+        return 'refurbished'
+    if 'parts' in text or 'not working' in text:
+        return 'other'
+    if any(word in text for word in ('used', 'pre-owned', 'preowned', 'like new', 'very good', 'good', 'acceptable')):
+        return 'used'
+    if 'new' in text or 'open box' in text:
+        return 'new'
+    return 'other'
+
+
+def backfill_condition_bucket(apps, schema_editor):
+    SearchResult = apps.get_model('finder', 'SearchResult')
+    # eBay uses a handful of distinct condition strings, so one UPDATE per
+    # distinct value is far cheaper than touching rows one at a time.
+    conditions = SearchResult.objects.values_list('condition', flat=True).distinct()
+    for condition in list(conditions):
+        SearchResult.objects.filter(condition=condition).update(
+            condition_bucket=condition_bucket(condition)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0008_searchresult_item_identity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchresult',
+            name='condition_bucket',
+            field=models.CharField(choices=[('new', 'New'), ('used', 'Used'), ('refurbished', 'Refurbished'), ('other', 'Other')], default='other', max_length=12),
+        ),
+        migrations.RunPython(backfill_condition_bucket, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='searchresult',
+            index=models.Index(fields=['product_image', 'condition_bucket', 'price'], name='finder_sear_product_15aca6_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0009_searchresult_condition_bucket'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listingproduct',
+            index=models.Index(fields=['created_at', 'id'], name='finder_list_created_18a23a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchresult',
+            index=models.Index(fields=['product_image', 'price'], name='finder_sear_product_161cd6_idx'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+from django.db import migrations
+
+# The SQL is frozen here rather than imported from finder.price_index, so
+# later changes to that module cannot change what this migration does.
+
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS finder_searchresult_fts USING fts5("
+    "title, description, content='finder_searchresult', content_rowid='id', "
+    "tokenize='porter unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS finder_searchresult_fts_ai AFTER INSERT ON finder_searchresult BEGIN "
+    "INSERT INTO finder_searchresult_fts (rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS finder_searchresult_fts_ad AFTER DELETE ON finder_searchresult BEGIN "
+    "INSERT INTO finder_searchresult_fts (finder_searchresult_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS finder_searchresult_fts_au "
+    "AFTER UPDATE OF title, description ON finder_searchresult BEGIN "
+    "INSERT INTO finder_searchresult_fts (finder_searchresult_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO finder_searchresult_fts (rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    "INSERT INTO finder_searchresult_fts (finder_searchresult_fts) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS finder_searchresult_fts_ai",
+    "DROP TRIGGER IF EXISTS finder_searchresult_fts_ad",
+    "DROP TRIGGER IF EXISTS finder_searchresult_fts_au",
+    "DROP TABLE IF EXISTS finder_searchresult_fts",
+]
+
+POSTGRES_INSTALL = [
+    "CREATE INDEX IF NOT EXISTS finder_searchresult_fts_idx ON finder_searchresult "
+    "USING GIN (to_tsvector('english', title || ' ' || description))",
+]
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS finder_searchresult_fts_idx",
+]
+
+
+def _sqlite_has_fts5(connection) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+class RunVendorSQL(migrations.RunSQL):
+    """``RunSQL`` that only runs on one database vendor.
+
+    On SQLite builds without FTS5 it does nothing, and searches fall back
+    to substring matching.
+    """
+
+    def __init__(self, vendor, sql, reverse_sql, **kwargs):
+        self.vendor = vendor
+        super().__init__(sql, reverse_sql, **kwargs)
+
+    def _applies(self, connection) -> bool:
+        if connection.vendor != self.vendor:
+            return False
+        return connection.vendor != 'sqlite' or _sqlite_has_fts5(connection)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if self._applies(schema_editor.connection):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if self._applies(schema_editor.connection):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0012_searchlock'),
+    ]
+
+    operations = [
+        RunVendorSQL('sqlite', SQLITE_INSTALL, SQLITE_UNINSTALL),
+        RunVendorSQL('postgresql', POSTGRES_INSTALL, POSTGRES_UNINSTALL),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:54
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_last_seen_at(apps, schema_editor):
+    SearchResult = apps.get_model('finder', 'SearchResult')
+    SearchResult.objects.filter(last_seen_at__isnull=True).update(last_seen_at=F('searched_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finder', '0013_searchresult_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchresult',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_last_seen_at, migrations.RunPython.noop),
+    ]
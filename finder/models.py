@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 import os
 
 
@@ -20,13 +21,42 @@ class ProductImage(models.Model):
         return f"Image {self.id} - {self.detected_label or 'Unknown'}"
 
 
+def condition_bucket(condition: str) -> str:
+    """Map eBay's free-text condition onto a SearchResult.CONDITION_* bucket."""
+    text = (condition or '').lower()
+    if not text:
+        return SearchResult.CONDITION_OTHER
+    if 'refurb' in text:
+        return SearchResult.CONDITION_REFURBISHED
+    if 'parts' in text or 'not working' in text:
+        return SearchResult.CONDITION_OTHER
+    if any(word in text for word in ('used', 'pre-owned', 'preowned', 'like new', 'very good', 'good', 'acceptable')):
+        return SearchResult.CONDITION_USED
+    if 'new' in text or 'open box' in text:
+        return SearchResult.CONDITION_NEW
+    return SearchResult.CONDITION_OTHER
+
+
 class SearchResult(models.Model):
+
+    CONDITION_NEW = 'new'
+    CONDITION_USED = 'used'
+    CONDITION_REFURBISHED = 'refurbished'
+    CONDITION_OTHER = 'other'
+
+    CONDITION_BUCKET_CHOICES = [
+        (CONDITION_NEW, 'New'),
+        (CONDITION_USED, 'Used'),
+        (CONDITION_REFURBISHED, 'Refurbished'),
+        (CONDITION_OTHER, 'Other'),
+    ]
     
     product_image = models.ForeignKey(
         ProductImage, 
         on_delete=models.CASCADE, 
         related_name='search_results'
     )
+    item_id = models.CharField(max_length=100, blank=True)
     title = models.CharField(max_length=500)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=10, default='USD')
@@ -34,11 +64,22 @@ class SearchResult(models.Model):
     item_url = models.URLField(max_length=1000)
     image_url = models.URLField(max_length=1000, blank=True)
     condition = models.CharField(max_length=100, blank=True)
+    condition_bucket = models.CharField(
+        max_length=12, choices=CONDITION_BUCKET_CHOICES, default=CONDITION_OTHER
+    )
     description = models.TextField(blank=True)
     searched_at = models.DateTimeField(auto_now_add=True)
+    # When a search last returned this listing; refreshes move it forward.
+    last_seen_at = models.DateTimeField(null=True, blank=True)
+    ended_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['price']
+        indexes = [
+            models.Index(fields=['product_image', 'item_id']),
+            models.Index(fields=['product_image', 'condition_bucket', 'price']),
+            models.Index(fields=['product_image', 'price']),
+        ]
     
     def __str__(self):
         return f"{self.title[:50]} - ${self.price}"
@@ -84,9 +125,127 @@ class ListingProduct(models.Model):
     category_id = models.CharField(max_length=32)
     image = models.ImageField(upload_to=upload_to, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Filled in by `manage.py reprice_catalog`; price_delta is price - suggested_price.
+    suggested_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    price_delta = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    market_listings = models.PositiveIntegerField(default=0)
+    repriced_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.title} (${self.price})"
+
+
+class PriceSnapshot(models.Model):
+
+    RESOLUTION_HOUR = 'hour'
+    RESOLUTION_DAY = 'day'
+    RESOLUTION_WEEK = 'week'
+
+    RESOLUTION_CHOICES = [
+        (RESOLUTION_HOUR, 'Hourly'),
+        (RESOLUTION_DAY, 'Daily'),
+        (RESOLUTION_WEEK, 'Weekly'),
+    ]
+
+    keyword = models.CharField(max_length=255)
+    resolution = models.CharField(max_length=4, choices=RESOLUTION_CHOICES, default=RESOLUTION_HOUR)
+    bucket_start = models.DateTimeField()
+    samples = models.PositiveIntegerField(default=0)
+    listings = models.PositiveIntegerField(default=0)
+    # Prices are stored in integer cents.
+    min_cents = models.IntegerField()
+    max_cents = models.IntegerField()
+    sum_cents = models.BigIntegerField()
+    p25_cents = models.IntegerField()
+    median_cents = models.IntegerField()
+    p75_cents = models.IntegerField()
+    suggested_cents = models.IntegerField()
+
+    class Meta:
+        ordering = ['keyword', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['keyword', 'resolution', 'bucket_start'],
+                name='unique_price_snapshot_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['keyword', 'bucket_start']),
+            models.Index(fields=['resolution', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.keyword} @ {self.bucket_start:%Y-%m-%d %H:%M} ({self.resolution})"
+
+
+class RecognitionCacheEntry(models.Model):
+
+    content_hash = models.CharField(max_length=64, unique=True)
+    primary_label = models.CharField(max_length=255)
+    labels = models.JSONField(default=list)
+    web_label = models.CharField(max_length=255, blank=True)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name_plural = 'recognition cache entries'
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} - {self.primary_label}"
+
+
+class SearchJob(models.Model):
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    product_image = models.ForeignKey(
+        ProductImage,
+        on_delete=models.CASCADE,
+        related_name='search_jobs'
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} ({self.status}) for image {self.product_image_id}"
+
+
+class SearchLock(models.Model):
+    """Marks a search key as being fetched by one process (see finder.coalesce)."""
+
+    key = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=255)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key} held by {self.owner}"
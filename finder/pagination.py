@@ -0,0 +1,101 @@
+"""
+Keyset (cursor) pagination.
+
+A cursor holds the ordering values of the last row on the previous page, so
+the next page is a ``WHERE (a, b) > (x, y) ORDER BY a, b LIMIT n`` that an
+index on the ordering columns can seek to directly: fetching page N costs
+the same as fetching page 1. The ordering must end in a unique column
+(normally ``pk``) so that ties are broken deterministically.
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Sequence
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, QuerySet
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder truncates datetimes to milliseconds; cursors need them exact."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+@dataclass
+class Page:
+    items: list
+    next_cursor: Optional[str]
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps(list(values), cls=_CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, length: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("Malformed cursor") from exc
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor("Cursor does not match the ordering")
+    return values
+
+
+def _after(ordering: Sequence[str], values: Sequence) -> Q:
+    """Build ``(a, b, c) > (x, y, z)`` as nested ORs, honouring ``-`` prefixes."""
+    condition = Q()
+    for index in range(len(ordering) - 1, -1, -1):
+        field = ordering[index].lstrip('-')
+        lookup = 'lt' if ordering[index].startswith('-') else 'gt'
+        step = Q(**{f'{field}__{lookup}': values[index]})
+        if index < len(ordering) - 1:
+            step |= Q(**{field: values[index]}) & condition
+        condition = step
+    return condition
+
+
+def paginate(
+    queryset: QuerySet,
+    ordering: Sequence[str],
+    cursor: Optional[str] = None,
+    page_size: int = 24,
+) -> Page:
+    """
+    Return the page of ``queryset`` that follows ``cursor`` in ``ordering``.
+
+    Raises ``InvalidCursor`` if the cursor cannot be decoded. Values in the
+    cursor are plain JSON; the model fields parse them back when filtering.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor, len(ordering))
+        try:
+            queryset = queryset.filter(_after(ordering, values))
+        except (ValidationError, ValueError, TypeError) as exc:
+            raise InvalidCursor("Cursor values do not match the ordering") from exc
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(
+            [getattr(last, field.lstrip('-')) for field in ordering]
+        )
+    return Page(items=items, next_cursor=next_cursor)
@@ -0,0 +1,209 @@
+"""
+Local full-text price index over stored search results.
+
+Every ``SearchResult`` we store is market data an eBay call already paid
+for. On SQLite an FTS5 table over title and description is kept in step
+with ``finder_searchresult`` by triggers; on PostgreSQL a GIN index over
+the same text serves the same queries. ``local_estimate`` matches a query
+against recently stored listings and prices them without leaving the
+database, so ``api_search`` can answer at once and only go to eBay when
+the local evidence is too thin or too old.
+
+Django rebuilds a SQLite table for some schema changes, which drops its
+triggers; run ``manage.py rebuild_price_index`` after such a migration.
+"""
+import re
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import OperationalError, connection as default_connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from . import price_stats
+from .listings import Listing
+from .models import SearchResult
+from .search_cache import normalize_keywords
+from .services import DEMO_ITEM_PREFIX, PriceSuggestionService
+
+FTS_TABLE = 'finder_searchresult_fts'
+
+SQLITE_INSTALL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, description, content='finder_searchresult', content_rowid='id', "
+    "tokenize='porter unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON finder_searchresult BEGIN "
+    f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON finder_searchresult BEGIN "
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, description ON finder_searchresult BEGIN "
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_DOCUMENT = "to_tsvector('english', title || ' ' || description)"
+POSTGRES_INSTALL = [
+    f"CREATE INDEX IF NOT EXISTS {FTS_TABLE}_idx ON finder_searchresult USING GIN ({POSTGRES_DOCUMENT})",
+]
+POSTGRES_UNINSTALL = [
+    f"DROP INDEX IF EXISTS {FTS_TABLE}_idx",
+]
+
+# Per database alias: whether the SQLite FTS5 table exists.
+_fts_available: dict[str, bool] = {}
+
+
+def install(connection) -> bool:
+    """
+    Create the index (and on SQLite its triggers) and fill it from the
+    stored results. Returns ``False`` if the database cannot host it, e.g.
+    a SQLite build without FTS5; searches then fall back to substring matching.
+    """
+    statements = {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL}.get(connection.vendor)
+    if statements is None:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    except OperationalError:
+        if connection.vendor != 'sqlite':
+            raise
+        return False
+    finally:
+        _fts_available.pop(connection.alias, None)
+    return True
+
+
+def uninstall(connection) -> None:
+    statements = {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    _fts_available.pop(connection.alias, None)
+
+
+def _sqlite_fts_available(connection) -> bool:
+    available = _fts_available.get(connection.alias)
+    if available is None:
+        available = _fts_available[connection.alias] = FTS_TABLE in connection.introspection.table_names()
+    return available
+
+
+def match_filter(keywords: str, limit: int, connection=default_connection) -> Optional[Q]:
+    """
+    A filter for the ``limit`` most recently stored active ``SearchResult``
+    rows whose title or description contain every term.
+
+    Ids grow with insertion time, so the newest matches are read straight
+    off the index in descending id order instead of sorting every match.
+    Demo listings are skipped inside the index query so they cannot use up
+    the ``limit``.
+    """
+    terms = re.findall(r'\w+', normalize_keywords(keywords))
+    if not terms:
+        return None
+
+    real = f"{DEMO_ITEM_PREFIX}%"
+    if connection.vendor == 'sqlite' and _sqlite_fts_available(connection):
+        # Quoted terms are matched literally, so user input cannot inject FTS syntax.
+        query = ' '.join(f'"{term}"' for term in terms)
+        return Q(pk__in=RawSQL(
+            f"SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} "
+            f"JOIN finder_searchresult ON finder_searchresult.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND finder_searchresult.ended_at IS NULL "
+            f"AND finder_searchresult.item_id NOT LIKE %s "
+            f"ORDER BY {FTS_TABLE}.rowid DESC LIMIT %s",
+            (query, real, limit),
+        ))
+    if connection.vendor == 'postgresql':
+        return Q(pk__in=RawSQL(
+            f"SELECT id FROM finder_searchresult WHERE {POSTGRES_DOCUMENT} @@ plainto_tsquery('english', %s) "
+            "AND ended_at IS NULL AND item_id NOT LIKE %s ORDER BY id DESC LIMIT %s",
+            (' '.join(terms), real, limit),
+        ))
+
+    condition = Q(ended_at__isnull=True) & ~Q(item_id__startswith=DEMO_ITEM_PREFIX)
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(description__icontains=term)
+    return condition
+
+
+def local_estimate(
+    keywords: str,
+    max_age_hours: Optional[float] = None,
+    min_matches: Optional[int] = None,
+    max_matches: Optional[int] = None,
+) -> dict:
+    """
+    Price ``keywords`` from stored listings a search returned in the last
+    ``max_age_hours``.
+
+    Uses the ``max_matches`` most recently stored distinct listings (one row
+    per eBay item, however often it was stored); generated demo listings
+    are never used. ``sufficient`` says whether
+    there are at least ``min_matches`` of them, i.e. whether the estimate
+    can stand in for a live search.
+    """
+    if max_age_hours is None:
+        max_age_hours = settings.LOCAL_ESTIMATE_MAX_AGE_HOURS
+    if min_matches is None:
+        min_matches = settings.LOCAL_ESTIMATE_MIN_MATCHES
+    if max_matches is None:
+        max_matches = settings.LOCAL_ESTIMATE_MAX_MATCHES
+
+    estimate = {'listings': [], 'summary': None, 'matches': 0, 'as_of': None, 'sufficient': False}
+    # Over-fetch so duplicates of the same item do not leave us short.
+    candidates = max_matches * 4
+    match = match_filter(keywords, candidates)
+    if match is None:
+        return estimate
+
+    rows = (
+        SearchResult.objects.filter(match)
+        .filter(last_seen_at__gte=timezone.now() - timedelta(hours=max_age_hours))
+        .order_by('-pk')
+        .values_list(
+            'item_id', 'title', 'description', 'price', 'currency', 'seller_name',
+            'item_url', 'image_url', 'condition', 'last_seen_at',
+        )
+    )
+    listings = []
+    seen = set()
+    as_of = None
+    for row in rows[:candidates]:
+        item_id, title, description, price, currency, seller, item_url, image_url, condition, seen_at = row
+        key = item_id or item_url
+        if key in seen:
+            continue
+        seen.add(key)
+        as_of = seen_at if as_of is None else max(as_of, seen_at)
+        listings.append(Listing(
+            item_id, title, description, price_stats.to_cents(price), currency,
+            seller, item_url, image_url, condition,
+        ))
+        if len(listings) >= max_matches:
+            break
+
+    estimate.update(
+        listings=listings,
+        summary=PriceSuggestionService.summarize_cents([listing.price_cents for listing in listings]),
+        matches=len(listings),
+        as_of=as_of,
+        sufficient=len(listings) >= max(min_matches, 1),
+    )
+    return estimate
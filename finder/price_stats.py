@@ -0,0 +1,135 @@
+"""
+Price statistics over integer cents.
+
+Prices are converted to integer cents once, sorted once, and every
+statistic is read off the sorted values, so results are exact to the cent.
+NumPy is used for the sort, sums and outlier trimming when it is installed;
+otherwise the same algorithm runs on plain lists.
+"""
+from bisect import bisect_left, bisect_right
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CENT = Decimal("0.01")
+
+
+def to_cents(price) -> int:
+    return int((Decimal(price) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def cents_to_decimal(value) -> Decimal:
+    """Convert a (possibly fractional) cent amount to a Decimal rounded to the cent."""
+    return (Decimal(value) / 100).quantize(CENT, ROUND_HALF_UP)
+
+
+def _sorted_cents(cents: Iterable[int], backend: str):
+    if backend == 'numpy':
+        values = np.fromiter(cents, dtype=np.int64)
+        values.sort()
+        return values
+    return sorted(cents)
+
+
+def _percentile(values: Sequence[int], pct) -> Decimal:
+    """Linear-interpolated percentile of sorted ``values`` in exact cents."""
+    position = Decimal(len(values) - 1) * Decimal(pct) / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    fraction = position - lower
+    return Decimal(int(values[lower])) + (int(values[upper]) - int(values[lower])) * fraction
+
+
+def _trim(values, factor: float, backend: str):
+    """Drop values outside ``[Q1 - factor*IQR, Q3 + factor*IQR]``."""
+    q1 = _percentile(values, 25)
+    q3 = _percentile(values, 75)
+    spread = (q3 - q1) * Decimal(str(factor))
+    low, high = q1 - spread, q3 + spread
+    if backend == 'numpy':
+        start = int(np.searchsorted(values, float(low), side='left'))
+        end = int(np.searchsorted(values, float(high), side='right'))
+    else:
+        start = bisect_left(values, low)
+        end = bisect_right(values, high)
+    return values[start:end]
+
+
+def _summarize_sorted(values, percentiles: Sequence, backend: str) -> dict:
+    count = len(values)
+    total = int(values.sum()) if backend == 'numpy' else sum(values)
+    return {
+        "min_price": cents_to_decimal(int(values[0])),
+        "max_price": cents_to_decimal(int(values[-1])),
+        "average_price": cents_to_decimal(Decimal(total) / count),
+        "median_price": cents_to_decimal(_percentile(values, 50)),
+        "percentiles": {pct: cents_to_decimal(_percentile(values, pct)) for pct in percentiles},
+        "total_listings": count,
+    }
+
+
+def resolve_backend(backend: str = 'auto') -> str:
+    if backend == 'auto':
+        return 'numpy' if np is not None else 'python'
+    if backend == 'numpy' and np is None:
+        raise ImportError("NumPy is not installed")
+    return backend
+
+
+def summarize(
+    prices: Iterable,
+    percentiles: Sequence = (25, 75),
+    trim_outliers: bool = False,
+    iqr_factor: float = 1.5,
+    conditions: Optional[Iterable[str]] = None,
+    backend: str = 'auto',
+) -> Optional[dict]:
+    """
+    Summarize prices (Decimals, strings or numbers) in a single sorted pass.
+
+    Returns ``None`` for an empty input. With ``conditions`` (parallel to
+    ``prices``) the result carries a ``by_condition`` breakdown. With
+    ``trim_outliers`` values outside the Tukey fences are ignored and the
+    number dropped is reported as ``trimmed``.
+    """
+    return summarize_cents(
+        [to_cents(price) for price in prices],
+        percentiles=percentiles,
+        trim_outliers=trim_outliers,
+        iqr_factor=iqr_factor,
+        conditions=conditions,
+        backend=backend,
+    )
+
+
+def summarize_cents(
+    cents: Sequence[int],
+    percentiles: Sequence = (25, 75),
+    trim_outliers: bool = False,
+    iqr_factor: float = 1.5,
+    conditions: Optional[Iterable[str]] = None,
+    backend: str = 'auto',
+) -> Optional[dict]:
+    """Same as ``summarize`` for prices already expressed in integer cents."""
+    backend = resolve_backend(backend)
+    if not len(cents):
+        return None
+
+    values = _sorted_cents(cents, backend)
+    kept = _trim(values, iqr_factor, backend) if trim_outliers and len(values) >= 4 else values
+    summary = _summarize_sorted(kept, percentiles, backend)
+    summary["trimmed"] = len(values) - len(kept)
+
+    if conditions is not None:
+        groups: dict[str, list[int]] = {}
+        for value, condition in zip(cents, conditions):
+            groups.setdefault(condition or "", []).append(value)
+        summary["by_condition"] = {
+            condition: _summarize_sorted(_sorted_cents(group, backend), percentiles, backend)
+            for condition, group in groups.items()
+        }
+    return summary
@@ -0,0 +1,215 @@
+"""
+Host-wide token-bucket rate limiter for outbound eBay calls.
+
+The bucket lives in a small SQLite file so that every worker process on the
+host draws from the same budget without an external service; each attempt
+to take a token is one ``BEGIN IMMEDIATE`` transaction. Calls are also
+counted per UTC day against the daily quota.
+
+There are two priority classes. Interactive calls may drain the bucket and
+the daily quota completely. Batch calls must leave ``batch_reserve`` of
+both untouched, so bulk jobs cannot starve requests a user is waiting on.
+A caller that would have to wait longer than its ``max_wait`` gets
+``RateLimitExceeded`` instead of being queued indefinitely.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BATCH = 'batch'
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+
+class RateLimitExceeded(Exception):
+    """No eBay call budget is available within the caller's maximum wait."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _today() -> str:
+    return datetime.now(dt_timezone.utc).date().isoformat()
+
+
+def _seconds_until_tomorrow() -> float:
+    now = datetime.now(dt_timezone.utc)
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), dt_timezone.utc)
+    return (tomorrow - now).total_seconds()
+
+
+class RateLimiter:
+    """Token bucket refilled at ``rate`` per second up to ``burst``, plus a daily quota."""
+
+    def __init__(
+        self,
+        path,
+        rate: float = 5.0,
+        burst: int = 10,
+        daily_quota: int = 5000,
+        batch_reserve: float = 0.2,
+        max_wait: Optional[dict] = None,
+    ) -> None:
+        self.path = Path(path)
+        self.rate = rate
+        self.burst = burst
+        self.daily_quota = daily_quota
+        self.batch_reserve = batch_reserve
+        self.max_wait = max_wait or {PRIORITY_INTERACTIVE: 2.0, PRIORITY_BATCH: 60.0}
+        self._local = threading.local()
+
+    def acquire(self, priority: str = PRIORITY_INTERACTIVE, max_wait: Optional[float] = None) -> None:
+        """
+        Take one call from the budget, sleeping until a token is available.
+
+        Raises ``RateLimitExceeded`` if that would take longer than
+        ``max_wait`` seconds (the priority's default when omitted) or if the
+        daily quota for the priority is used up.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}")
+        if max_wait is None:
+            max_wait = self.max_wait[priority]
+        deadline = time.monotonic() + max_wait
+
+        while True:
+            wait = self._try_acquire(priority)
+            if wait == 0:
+                return
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                raise RateLimitExceeded(
+                    f"eBay call budget exhausted for {priority} requests", retry_after=wait
+                )
+            time.sleep(wait)
+
+    def drain(self, seconds: float) -> None:
+        """Empty the bucket so nobody calls eBay for ``seconds`` (used after a 429)."""
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE bucket SET tokens = ?, updated = ? WHERE id = 1",
+                (-self.rate * seconds, time.time()),
+            )
+
+    def status(self) -> dict:
+        """Current bucket level and today's quota usage per priority."""
+        with self._transaction() as db:
+            tokens = self._refill(db, time.time())
+            used = dict(db.execute("SELECT priority, calls FROM usage WHERE day = ?", (_today(),)).fetchall())
+        total_used = sum(used.values())
+        return {
+            'rate_per_second': self.rate,
+            'burst': self.burst,
+            'tokens': round(max(tokens, 0.0), 2),
+            'daily_quota': self.daily_quota,
+            'used_today': total_used,
+            'remaining_today': max(self.daily_quota - total_used, 0),
+            'remaining_today_batch': max(self._batch_quota() - total_used, 0),
+            'used_by_priority': {priority: used.get(priority, 0) for priority in PRIORITIES},
+            'resets_in': round(_seconds_until_tomorrow()),
+        }
+
+    def _try_acquire(self, priority: str) -> float:
+        """Take a token and return 0, or return how long to wait before retrying."""
+        floor = self.burst * self.batch_reserve if priority == PRIORITY_BATCH else 0.0
+        quota = self._batch_quota() if priority == PRIORITY_BATCH else self.daily_quota
+        with self._transaction() as db:
+            now = time.time()
+            day = _today()
+            used = db.execute("SELECT COALESCE(SUM(calls), 0) FROM usage WHERE day = ?", (day,)).fetchone()[0]
+            if used >= quota:
+                raise RateLimitExceeded(
+                    f"Daily eBay call quota exhausted for {priority} requests",
+                    retry_after=_seconds_until_tomorrow(),
+                )
+
+            tokens = self._refill(db, now)
+            if tokens - 1 < floor:
+                return (floor + 1 - tokens) / self.rate
+            db.execute("UPDATE bucket SET tokens = ?, updated = ? WHERE id = 1", (tokens - 1, now))
+            db.execute(
+                "INSERT INTO usage (day, priority, calls) VALUES (?, ?, 1) "
+                "ON CONFLICT (day, priority) DO UPDATE SET calls = calls + 1",
+                (day, priority),
+            )
+            return 0
+
+    def _refill(self, db: sqlite3.Connection, now: float) -> float:
+        tokens, updated = db.execute("SELECT tokens, updated FROM bucket WHERE id = 1").fetchone()
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        db.execute("UPDATE bucket SET tokens = ?, updated = ? WHERE id = 1", (tokens, now))
+        return tokens
+
+    def _batch_quota(self) -> int:
+        return int(self.daily_quota * (1 - self.batch_reserve))
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections must not cross threads or survive a fork.
+        db = getattr(self._local, 'db', None)
+        if db is not None and self._local.pid == os.getpid():
+            return db
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS bucket (id INTEGER PRIMARY KEY, tokens REAL, updated REAL)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            "day TEXT, priority TEXT, calls INTEGER, PRIMARY KEY (day, priority))"
+        )
+        db.execute("INSERT OR IGNORE INTO bucket (id, tokens, updated) VALUES (1, ?, ?)", (self.burst, time.time()))
+        cutoff = (datetime.now(dt_timezone.utc).date() - timedelta(days=30)).isoformat()
+        db.execute("DELETE FROM usage WHERE day < ?", (cutoff,))
+        self._local.db = db
+        self._local.pid = os.getpid()
+        return db
+
+
+class _Transaction:
+    """``BEGIN IMMEDIATE`` ... ``COMMIT`` so concurrent writers queue on the file lock."""
+
+    def __init__(self, db: sqlite3.Connection) -> None:
+        self.db = db
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """Return the limiter configured from settings, or ``None`` when disabled."""
+    global _rate_limiter
+    if not settings.EBAY_RATE_LIMIT_PER_SECOND:
+        return None
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter(
+                    settings.EBAY_RATE_LIMIT_PATH,
+                    rate=settings.EBAY_RATE_LIMIT_PER_SECOND,
+                    burst=settings.EBAY_RATE_LIMIT_BURST,
+                    daily_quota=settings.EBAY_DAILY_CALL_QUOTA,
+                    batch_reserve=settings.EBAY_RATE_LIMIT_BATCH_RESERVE,
+                    max_wait={
+                        PRIORITY_INTERACTIVE: settings.EBAY_RATE_LIMIT_MAX_WAIT,
+                        PRIORITY_BATCH: settings.EBAY_RATE_LIMIT_BATCH_MAX_WAIT,
+                    },
+                )
+    return _rate_limiter
@@ -0,0 +1,62 @@
+"""
+Persistent cache of Vision results keyed by the SHA-256 of the image bytes.
+"""
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import Counters
+from .models import RecognitionCacheEntry
+
+stats = Counters()
+
+
+def get_cached(digest: str) -> Optional[tuple[str, list[str], str]]:
+    """Return ``(primary, labels, web_label)`` for ``digest`` if a fresh entry exists."""
+    cutoff = timezone.now() - timedelta(days=settings.RECOGNITION_CACHE_TTL_DAYS)
+    entry = RecognitionCacheEntry.objects.filter(
+        content_hash=digest, created_at__gte=cutoff
+    ).first()
+    if entry is None:
+        stats.incr('misses')
+        return None
+
+    stats.incr('hits')
+    RecognitionCacheEntry.objects.filter(pk=entry.pk).update(
+        hits=F('hits') + 1, last_used_at=timezone.now()
+    )
+    return entry.primary_label, list(entry.labels), entry.web_label
+
+
+def store(digest: str, primary: str, labels: list[str], web_label: str) -> None:
+    RecognitionCacheEntry.objects.update_or_create(
+        content_hash=digest,
+        defaults={
+            'primary_label': primary[:255],
+            'labels': labels,
+            'web_label': web_label[:255],
+            'created_at': timezone.now(),
+            'last_used_at': timezone.now(),
+        },
+    )
+    evict()
+
+
+def evict() -> int:
+    """Drop expired entries, then the least recently used ones beyond the size cap."""
+    cutoff = timezone.now() - timedelta(days=settings.RECOGNITION_CACHE_TTL_DAYS)
+    removed, _ = RecognitionCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+
+    overflow = RecognitionCacheEntry.objects.count() - settings.RECOGNITION_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        stale_ids = list(
+            RecognitionCacheEntry.objects.order_by('last_used_at')
+            .values_list('pk', flat=True)[:overflow]
+        )
+        removed += RecognitionCacheEntry.objects.filter(pk__in=stale_ids).delete()[0]
+    if removed:
+        stats.incr('evictions', removed)
+    return removed
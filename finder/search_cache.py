@@ -0,0 +1,229 @@
+"""
+Two-tier cache for eBay search results.
+
+Tier one is a per-process LRU, tier two a shared Django cache (file-based by
+default, so every worker on the host sees the same entries). Entries are
+fresh for ``ttl`` seconds and may then be served stale for ``stale_ttl``
+more seconds while a background thread revalidates them.
+
+Misses are coalesced: concurrent fetches of one key in a process share a
+single upstream call, and with ``coalesce_across_processes`` a lock row
+lets other processes wait for that call's result in the shared tier.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .coalesce import SingleFlight, acquire_lock, is_locked, release_lock
+from .metrics import Counters
+
+# Bump when the cached value format changes (2: lists of ``Listing``).
+KEY_VERSION = 2
+
+
+def normalize_keywords(keywords: str) -> str:
+    """Lower-case keywords and collapse runs of whitespace."""
+    return " ".join(keywords.lower().split())
+
+
+def make_search_key(keywords: str, marketplace: str, search_filter: str, limit: int) -> str:
+    """Build a cache key from normalized keywords plus the query parameters."""
+    raw = f"{normalize_keywords(keywords)}|{marketplace}|{search_filter}|{limit}"
+    return f"ebay-search:v{KEY_VERSION}:" + hashlib.sha1(raw.encode()).hexdigest()
+
+
+class LRUCache:
+    """Size-bounded, thread-safe LRU map of key -> entry."""
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict) -> None:
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SearchCache:
+    """Cache-aside wrapper with stale-while-revalidate semantics."""
+
+    def __init__(
+        self,
+        ttl: int = 300,
+        stale_ttl: int = 900,
+        local_size: int = 256,
+        shared_alias: Optional[str] = 'search',
+        coalesce_across_processes: bool = False,
+        lock_timeout: float = 15.0,
+    ) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.local = LRUCache(local_size)
+        self.shared_alias = shared_alias
+        self.coalesce_across_processes = coalesce_across_processes
+        self.lock_timeout = lock_timeout
+        self.stats = Counters()
+        self.single_flight = SingleFlight(self.stats)
+        self._revalidating: set[str] = set()
+        self._revalidating_lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], list]) -> list:
+        """
+        Return the cached value for ``key`` or call ``fetch`` and cache its result.
+
+        Exceptions raised by ``fetch`` propagate and nothing is cached.
+        """
+        now = time.time()
+        entry = self.local.get(key)
+        tier = 'local'
+        if entry is None or entry['stale_until'] <= now:
+            entry = self.shared.get(key) if self.shared is not None else None
+            tier = 'shared'
+            if entry is not None and entry['stale_until'] > now:
+                self.local.set(key, entry)
+            else:
+                entry = None
+
+        if entry is None:
+            self.stats.incr('misses')
+            return self.single_flight.do(key, lambda: self._fetch_and_set(key, fetch))
+
+        if entry['fresh_until'] <= now:
+            self.stats.incr('stale_hits')
+            self._revalidate(key, fetch)
+        else:
+            self.stats.incr(f'{tier}_hits')
+        return entry['value']
+
+    def refresh(self, key: str, fetch: Callable[[], list]) -> list:
+        """Fetch a fresh value for ``key`` and cache it, sharing the call with concurrent callers."""
+        return self.single_flight.do(key, lambda: self._fetch_and_set(key, fetch))
+
+    def saved_calls(self) -> int:
+        """Upstream calls avoided by coalescing, in this process."""
+        counters = self.stats.snapshot()
+        return counters.get('coalesced', 0) + counters.get('coalesced_remote', 0)
+
+    def set(self, key: str, value: list) -> None:
+        now = time.time()
+        entry = {
+            'value': value,
+            'fresh_until': now + self.ttl,
+            'stale_until': now + self.ttl + self.stale_ttl,
+        }
+        self.local.set(key, entry)
+        if self.shared is not None:
+            self.shared.set(key, entry, timeout=self.ttl + self.stale_ttl)
+
+    def delete(self, key: str) -> None:
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def _fetch_and_set(self, key: str, fetch: Callable[[], list]) -> list:
+        if not self.coalesce_across_processes or self.shared is None:
+            value = fetch()
+            self.set(key, value)
+            return value
+
+        started = time.time()
+        if acquire_lock(key, self.lock_timeout):
+            try:
+                value = fetch()
+                self.set(key, value)
+                return value
+            finally:
+                release_lock(key)
+
+        value = self._wait_for_remote(key, started)
+        if value is not None:
+            self.stats.incr('coalesced_remote')
+            return value
+        # The other process failed or is too slow; fetch it ourselves.
+        self.stats.incr('remote_wait_misses')
+        value = fetch()
+        self.set(key, value)
+        return value
+
+    def _wait_for_remote(self, key: str, started: float) -> Optional[list]:
+        """Poll the shared tier for an entry written after ``started`` by the lock holder."""
+        deadline = started + self.lock_timeout
+        while True:
+            entry = self.shared.get(key)
+            if entry is not None and entry['fresh_until'] >= started + self.ttl:
+                self.local.set(key, entry)
+                return entry['value']
+            if time.time() >= deadline or not is_locked(key):
+                return None
+            time.sleep(0.05)
+
+    def _revalidate(self, key: str, fetch: Callable[[], list]) -> None:
+        with self._revalidating_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def run():
+            try:
+                self.set(key, fetch())
+                self.stats.incr('revalidations')
+            except Exception:
+                # Keep serving the stale entry; the next stale hit retries.
+                self.stats.incr('revalidation_errors')
+            finally:
+                with self._revalidating_lock:
+                    self._revalidating.discard(key)
+
+        threading.Thread(target=run, name=f"revalidate-{key[-8:]}", daemon=True).start()
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """Return the process-wide search cache configured from settings."""
+    global _search_cache
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                _search_cache = SearchCache(
+                    ttl=settings.EBAY_SEARCH_CACHE_TTL,
+                    stale_ttl=settings.EBAY_SEARCH_CACHE_STALE_TTL,
+                    local_size=settings.EBAY_SEARCH_CACHE_LOCAL_SIZE,
+                    shared_alias=settings.EBAY_SEARCH_CACHE_ALIAS or None,
+                    coalesce_across_processes=settings.EBAY_SEARCH_COALESCE_ACROSS_PROCESSES,
+                    lock_timeout=settings.EBAY_SEARCH_LOCK_TIMEOUT,
+                )
+    return _search_cache
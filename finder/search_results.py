@@ -0,0 +1,44 @@
+"""
+Building stored search results from ``Listing`` records.
+
+Shared by the views that persist a search and by ``manage.py import_images``,
+which writes many images' results in one transaction.
+"""
+from datetime import datetime
+from typing import Optional
+
+from django.utils import timezone
+
+from .listings import Listing
+from .models import PriceSuggestion, ProductImage, SearchResult, condition_bucket
+from .services import PriceSuggestionService
+
+
+def build_result_row(product_image: ProductImage, item: Listing, seen_at: datetime) -> SearchResult:
+    return SearchResult(
+        product_image=product_image,
+        item_id=item.item_id,
+        title=item.title,
+        price=item.price,
+        currency=item.currency,
+        seller_name=item.seller,
+        item_url=item.item_url,
+        image_url=item.image_url,
+        condition=item.condition,
+        condition_bucket=condition_bucket(item.condition),
+        description=item.description,
+        last_seen_at=seen_at,
+    )
+
+
+def build_search_rows(
+    product_image: ProductImage, results: list[Listing]
+) -> tuple[list[SearchResult], Optional[PriceSuggestion]]:
+    """Build unsaved ``SearchResult`` rows and the ``PriceSuggestion`` for a result set."""
+    now = timezone.now()
+    rows = [build_result_row(product_image, item, now) for item in results]
+    if not rows:
+        return rows, None
+
+    suggestion_data = PriceSuggestionService.calculate_suggestion([row.price for row in rows])
+    return rows, PriceSuggestion(product_image=product_image, **suggestion_data)
@@ -4,13 +4,23 @@ eBay API integration service with demo data fallback.
 import base64
 import os
 import random
-import statistics
-from decimal import Decimal
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterator, Optional
 
 import requests
 from django.conf import settings
 
+from . import price_stats, recognition_cache
+from .ratelimit import PRIORITY_INTERACTIVE, RateLimitExceeded
+from .imaging import content_hash, prepare_for_vision
+from .listings import Listing, parse_summaries
+from .search_cache import get_search_cache, make_search_key
+from .timing import PHASE_EBAY, PHASE_EBAY_OAUTH, PHASE_PRICING, PHASE_VISION, timed
+from .tokens import get_token_store
+from .transport import get_transport
+
 try:
     from google.cloud import vision
     from google.oauth2 import service_account
@@ -19,22 +29,60 @@ except ImportError:
     service_account = None
 
 
+# Item ids of generated demo listings start with this; they are not market data.
+DEMO_ITEM_PREFIX = "demo"
+
+
+def is_demo_listing(item_id: str) -> bool:
+    return item_id.startswith(DEMO_ITEM_PREFIX)
+
+
+class _IncompleteSearch(Exception):
+    """Carries a deep search's listings out of the cache without caching them."""
+
+    def __init__(self, results: list[Listing]) -> None:
+        super().__init__("Some result pages did not arrive")
+        self.results = results
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
 class EbayAPIService:
     
     
     OAUTH_TOKEN_URL = "https://api.ebay.com/identity/v1/oauth2/token"
     BROWSE_API_URL = "https://api.ebay.com/buy/browse/v1"
+    MARKETPLACE_ID = "EBAY_US"
+    SEARCH_FILTER = "buyingOptions:{FIXED_PRICE}"
+    MAX_PAGE_SIZE = 200
+    # The Browse API refuses offset + limit beyond this.
+    MAX_OFFSET = 10000
     
-    def __init__(self):
+    def __init__(self, priority: str = PRIORITY_INTERACTIVE, wait_until: Optional[float] = None):
         self.app_id = getattr(settings, 'EBAY_APP_ID', '')
         self.cert_id = getattr(settings, 'EBAY_CERT_ID', '')
-        self._access_token = None
+        self.oauth_token_url = getattr(settings, 'EBAY_OAUTH_TOKEN_URL', '') or self.OAUTH_TOKEN_URL
+        self.browse_api_url = getattr(settings, 'EBAY_BROWSE_API_URL', '') or self.BROWSE_API_URL
+        # Rate-limit class for every call this instance makes (see finder.ratelimit),
+        # and the time.monotonic() after which no call may still be waiting for budget.
+        self.priority = priority
+        self.wait_until = wait_until
+        self.transport = get_transport()
     
     def _get_oauth_token(self) -> Optional[str]:
-        """Get OAuth application token from eBay."""
+        """Get OAuth application token, reusing the shared cached token."""
         if not self.app_id or not self.cert_id:
             return None
-            
+        return get_token_store().get_token(self.app_id, self._fetch_oauth_token)
+    
+    @timed(PHASE_EBAY_OAUTH)
+    def _fetch_oauth_token(self) -> Optional[dict]:
+        """Request a new application token payload from eBay."""
         credentials = f"{self.app_id}:{self.cert_id}"
         encoded_credentials = base64.b64encode(credentials.encode()).decode()
         
@@ -49,64 +97,246 @@ class EbayAPIService:
         }
         
         try:
-            response = requests.post(self.OAUTH_TOKEN_URL, headers=headers, data=data)
+            response = self.transport.post(
+                self.oauth_token_url, name="oauth_token", priority=self.priority, max_wait=self._max_wait(),
+                headers=headers, data=data,
+            )
             response.raise_for_status()
-            return response.json().get("access_token")
-        except requests.RequestException:
+            return response.json()
+        except (requests.RequestException, ValueError):
+            return None
+    
+    def _max_wait(self) -> Optional[float]:
+        if self.wait_until is None:
             return None
+        return max(self.wait_until - time.monotonic(), 0.0)
     
     @property
     def access_token(self) -> Optional[str]:
-        if not self._access_token:
-            self._access_token = self._get_oauth_token()
-        return self._access_token
+        return self._get_oauth_token()
+    
+    @timed(PHASE_EBAY)
+    def search_products(
+        self,
+        keywords: str,
+        limit: int = 50,
+        use_cache: bool = True,
+        category_id: Optional[str] = None,
+    ) -> list[Listing]:
+        """
+        Search for products on eBay by keywords, optionally within a category.
+
+        Results are served from the shared search cache when possible; pass
+        ``use_cache=False`` to force a live fetch (the result is still cached).
+        Raises ``RateLimitExceeded`` rather than serving demo data when the
+        eBay call budget is exhausted.
+        """
+        if not self.access_token:
+            return self._get_demo_results(keywords)
+        
+        limit = min(limit, self.MAX_PAGE_SIZE)
+        cache = get_search_cache()
+        search_filter = f"{self.SEARCH_FILTER}|category:{category_id}" if category_id else self.SEARCH_FILTER
+        key = make_search_key(keywords, self.MARKETPLACE_ID, search_filter, limit)
+        
+        def fetch():
+            return self._fetch_search(keywords, limit, category_id=category_id)
+        
+        try:
+            if use_cache:
+                return cache.get_or_fetch(key, fetch)
+            return cache.refresh(key, fetch)
+        except requests.RequestException:
+            return self._get_demo_results(keywords)
     
-    def search_products(self, keywords: str, limit: int = 50) -> list[dict]:
-        """Search for products on eBay by keywords."""
+    @timed(PHASE_EBAY)
+    def deep_search(
+        self,
+        keywords: str,
+        max_items: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> list[Listing]:
+        """
+        Search beyond the single-page limit, fetching offset pages concurrently.
+
+        ``max_items`` caps the number of listings collected and ``deadline`` is
+        a time budget in seconds; whichever is hit first ends the search and
+        the listings gathered so far are returned. Only complete searches
+        (no deadline, every page arrived) are cached.
+        """
         if not self.access_token:
             return self._get_demo_results(keywords)
         
+        max_items = max_items or settings.EBAY_DEEP_SEARCH_MAX_ITEMS
+        
+        def fetch():
+            results = []
+            pages = self.iter_search_pages(keywords, max_items=max_items, deadline=deadline)
+            while True:
+                try:
+                    results.extend(next(pages))
+                except StopIteration as done:
+                    missing = done.value
+                    break
+            results = results[:max_items]
+            if missing:
+                raise _IncompleteSearch(results)
+            return results
+        
+        try:
+            if deadline is not None:
+                return fetch()
+            key = make_search_key(keywords, self.MARKETPLACE_ID, self.SEARCH_FILTER, f"deep:{max_items}")
+            return get_search_cache().get_or_fetch(key, fetch)
+        except _IncompleteSearch as exc:
+            return exc.results
+        except requests.RequestException:
+            return self._get_demo_results(keywords)
+    
+    @timed(PHASE_EBAY)
+    def search_many(
+        self,
+        keywords_list: list[str],
+        concurrency: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> dict:
+        """
+        Run ``search_products`` for several keyword strings concurrently.
+
+        Returns a dict mapping each keyword string to its listings, or to the
+        exception its search raised. Searches still running after ``deadline``
+        seconds are abandoned and their keywords are absent from the result.
+        """
+        results = {}
+        pool = ThreadPoolExecutor(
+            max_workers=concurrency or settings.EBAY_BATCH_SEARCH_CONCURRENCY,
+            thread_name_prefix="ebay-batch",
+        )
+        try:
+            futures = {pool.submit(self.search_products, keywords): keywords for keywords in keywords_list}
+            try:
+                for future in as_completed(futures, timeout=deadline):
+                    try:
+                        results[futures[future]] = future.result()
+                    except Exception as exc:
+                        results[futures[future]] = exc
+            except FuturesTimeout:
+                pass
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        return results
+    
+    def iter_search_pages(
+        self,
+        keywords: str,
+        max_items: int = 1000,
+        deadline: Optional[float] = None,
+        concurrency: Optional[int] = None,
+    ) -> Iterator[list[Listing]]:
+        """
+        Yield parsed pages of listings as they arrive.
+
+        The first page is fetched on its own to learn the total; the remaining
+        offsets are fetched through a bounded thread pool and yielded in
+        completion order. Failed follow-up pages are skipped. Raises
+        ``requests.RequestException`` if the first page fails.
+
+        The generator's return value is the number of follow-up pages that
+        were skipped or never fetched (0 when ``max_items`` were collected).
+        """
+        started = time.monotonic()
+        page_size = min(max_items, self.MAX_PAGE_SIZE)
+        payload = self._fetch_page(keywords, page_size, 0)
+        first_page = self._parse_items(payload.get("itemSummaries", []))
+        yield first_page
+        
+        collected = len(first_page)
+        total = min(int(payload.get("total") or 0), max_items, self.MAX_OFFSET)
+        offsets = list(range(page_size, total, page_size))
+        if not offsets or collected >= max_items:
+            return 0
+        
+        arrived = 0
+        pool = ThreadPoolExecutor(
+            max_workers=concurrency or settings.EBAY_DEEP_SEARCH_CONCURRENCY,
+            thread_name_prefix="ebay-page",
+        )
+        try:
+            futures = [
+                pool.submit(self._fetch_page, keywords, min(page_size, total - offset), offset)
+                for offset in offsets
+            ]
+            remaining = None if deadline is None else max(0.0, deadline - (time.monotonic() - started))
+            try:
+                for future in as_completed(futures, timeout=remaining):
+                    try:
+                        items = future.result().get("itemSummaries", [])
+                    except requests.RequestException:
+                        continue
+                    except RateLimitExceeded:
+                        # Out of budget: keep what has arrived, skip the rest.
+                        break
+                    arrived += 1
+                    page = self._parse_items(items)
+                    yield page
+                    collected += len(page)
+                    if collected >= max_items:
+                        break
+            except FuturesTimeout:
+                pass
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        return 0 if collected >= max_items else len(offsets) - arrived
+    
+    def _fetch_search(self, keywords: str, limit: int, category_id: Optional[str] = None) -> list[Listing]:
+        """Fetch one page of live results; raises ``requests.RequestException``."""
+        payload = self._fetch_page(keywords, limit, 0, category_id=category_id)
+        return self._parse_items(payload.get("itemSummaries", []))
+    
+    @timed(PHASE_EBAY)
+    def _fetch_page(
+        self, keywords: str, limit: int, offset: int, category_id: Optional[str] = None
+    ) -> dict:
+        """Fetch a raw Browse API search page; raises ``requests.RequestException``."""
+        access_token = self.access_token
+        if not access_token:
+            raise requests.RequestException("No eBay access token available")
+        
         headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "X-EBAY-C-MARKETPLACE-ID": "EBAY_US",
+            "Authorization": f"Bearer {access_token}",
+            "X-EBAY-C-MARKETPLACE-ID": self.MARKETPLACE_ID,
             "Content-Type": "application/json"
         }
         
         params = {
             "q": keywords,
-            "limit": min(limit, 200),
-            "filter": "buyingOptions:{FIXED_PRICE}"
+            "limit": limit,
+            "offset": offset,
+            "filter": self.SEARCH_FILTER
         }
+        if category_id:
+            params["category_ids"] = category_id
         
-        try:
-            response = requests.get(
-                f"{self.BROWSE_API_URL}/item_summary/search",
-                headers=headers,
-                params=params
+        response = self.transport.get(
+            f"{self.browse_api_url}/item_summary/search",
+            name="browse_search",
+            priority=self.priority,
+            max_wait=self._max_wait(),
+            headers=headers,
+            params=params
+        )
+        if response.status_code == 429:
+            raise RateLimitExceeded(
+                "eBay rejected the search with 429 Too Many Requests",
+                retry_after=_retry_after(response),
             )
-            response.raise_for_status()
-            items = response.json().get("itemSummaries", [])
-            return self._parse_items(items)
-        except requests.RequestException:
-            return self._get_demo_results(keywords)
+        response.raise_for_status()
+        return response.json()
     
-    def _parse_items(self, items: list) -> list[dict]:
-        results = []
-        for item in items:
-            price_info = item.get("price", {})
-            results.append({
-                "title": item.get("title", ""),
-                "description": item.get("shortDescription", ""),
-                "price": Decimal(price_info.get("value", "0")),
-                "currency": price_info.get("currency", "USD"),
-                "seller": item.get("seller", {}).get("username", ""),
-                "item_url": item.get("itemWebUrl", ""),
-                "image_url": item.get("image", {}).get("imageUrl", ""),
-                "condition": item.get("condition", ""),
-            })
-        return results
+    def _parse_items(self, items: list) -> list[Listing]:
+        return parse_summaries(items)
     
-    def _get_demo_results(self, keywords: str) -> list[dict]:
+    def _get_demo_results(self, keywords: str) -> list[Listing]:
        
         base_prices = {
             "oil": 25.99, "bottle": 15.99, "motor": 35.99,
@@ -130,24 +360,27 @@ class EbayAPIService:
         results = []
         for i in range(12):
             price_variation = random.uniform(0.7, 1.4)
-            price = round(base_price * price_variation, 2)
+            price_cents = round(base_price * price_variation * 100)
             
-            results.append({
-                "title": f"{keywords} - {random.choice(['Brand New', 'Premium', 'Best Seller', 'Top Rated'])} - Listing {i+1}",
-                "description": f"{keywords} demo listing with standard features.",
-                "price": Decimal(str(price)),
-                "currency": "USD",
-                "seller": random.choice(demo_sellers),
-                "item_url": f"https://www.ebay.com/itm/demo{i+1}",
-                "image_url": "",
-                "condition": random.choice(["New", "New", "New", "Like New", "Used"]),
-            })
+            results.append(Listing(
+                item_id=f"{DEMO_ITEM_PREFIX}{i+1}",
+                title=f"{keywords} - {random.choice(['Brand New', 'Premium', 'Best Seller', 'Top Rated'])} - Listing {i+1}",
+                description=f"{keywords} demo listing with standard features.",
+                price_cents=price_cents,
+                currency="USD",
+                seller=random.choice(demo_sellers),
+                item_url=f"https://www.ebay.com/itm/demo{i+1}",
+                image_url="",
+                condition=random.choice(["New", "New", "New", "Like New", "Used"]),
+            ))
         
-        return sorted(results, key=lambda x: x["price"])
+        return sorted(results, key=lambda x: x.price_cents)
 
 
 class ImageRecognitionService:
     
+    # Vision accepts at most 16 images per batch_annotate_images call.
+    BATCH_SIZE = 16
     
     def __init__(self) -> None:
         self._client = None
@@ -167,24 +400,60 @@ class ImageRecognitionService:
             self._client = vision.ImageAnnotatorClient(credentials=credentials)
             self._enabled = True
 
+    @timed(PHASE_VISION)
     def recognize_product(self, image_path: str) -> tuple[str, list[str], str]:
         """Return primary label, labels list, and optional web label."""
         if not self._enabled:
             primary = self._fallback_keywords(image_path)
             return primary, [primary], ""
 
-        with open(image_path, "rb") as image_file:
-            content = image_file.read()
+        digest = content_hash(image_path)
+        cached = recognition_cache.get_cached(digest)
+        if cached is not None:
+            return cached
+
+        content = prepare_for_vision(image_path)
+        response = self._client.annotate_image(self._annotate_request(content))
+        return self._handle_response(image_path, digest, response)
+
+    @timed(PHASE_VISION)
+    def recognize_batch(self, images: list[tuple[str, str, bytes]]) -> list[tuple[str, list[str], str]]:
+        """
+        Recognize many images, given as ``(image_path, content_hash, content)``.
+
+        Cached results are reused; the rest go to Vision in
+        ``batch_annotate_images`` calls of up to ``BATCH_SIZE`` images.
+        Results are returned in input order.
+        """
+        if not self._enabled:
+            results = []
+            for image_path, _, _ in images:
+                primary = self._fallback_keywords(image_path)
+                results.append((primary, [primary], ""))
+            return results
+
+        results: list = [recognition_cache.get_cached(digest) for _, digest, _ in images]
+        pending = [index for index, cached in enumerate(results) if cached is None]
+        for start in range(0, len(pending), self.BATCH_SIZE):
+            group = pending[start:start + self.BATCH_SIZE]
+            batch = self._client.batch_annotate_images(requests=[
+                self._annotate_request(images[index][2]) for index in group
+            ])
+            for index, response in zip(group, batch.responses):
+                image_path, digest, _ = images[index]
+                results[index] = self._handle_response(image_path, digest, response)
+        return results
 
-        image = vision.Image(content=content)
-        response = self._client.annotate_image({
-            "image": image,
+    def _annotate_request(self, content: bytes) -> dict:
+        return {
+            "image": vision.Image(content=content),
             "features": [
                 {"type": vision.Feature.Type.LABEL_DETECTION, "max_results": 7},
                 {"type": vision.Feature.Type.WEB_DETECTION, "max_results": 3},
             ],
-        })
+        }
 
+    def _handle_response(self, image_path: str, digest: str, response) -> tuple[str, list[str], str]:
         if response.error.message:
             primary = self._fallback_keywords(image_path)
             return primary, [primary], ""
@@ -198,6 +467,7 @@ class ImageRecognitionService:
         if primary and primary not in labels:
             labels.insert(0, primary)
 
+        recognition_cache.store(digest, primary, labels, web_label)
         return primary, labels, web_label
 
     def _fallback_keywords(self, image_path: str) -> str:
@@ -211,8 +481,10 @@ class PriceSuggestionService:
     
     
     @staticmethod
-    def calculate_suggestion(prices: list[Decimal]) -> dict:
-        if not prices:
+    @timed(PHASE_PRICING)
+    def calculate_suggestion(prices: list[Decimal], trim_outliers: Optional[bool] = None) -> dict:
+        summary = PriceSuggestionService.summarize(prices, trim_outliers=trim_outliers)
+        if summary is None:
             return {
                 "min_price": Decimal("0"),
                 "max_price": Decimal("0"),
@@ -222,25 +494,57 @@ class PriceSuggestionService:
                 "total_listings": 0,
             }
         
-        float_prices = [float(p) for p in prices]
-        
-        min_price = min(float_prices)
-        max_price = max(float_prices)
-        average_price = statistics.mean(float_prices)
-        median_price = statistics.median(float_prices)
-        
-        # Price 5% below median for competitive edge
-        suggested = median_price * 0.95
-        if suggested < min_price:
-            suggested = min_price
-        if suggested > max_price * 0.9:
-            suggested = max_price * 0.9
-        
         return {
-            "min_price": Decimal(str(round(min_price, 2))),
-            "max_price": Decimal(str(round(max_price, 2))),
-            "average_price": Decimal(str(round(average_price, 2))),
-            "median_price": Decimal(str(round(median_price, 2))),
-            "suggested_price": Decimal(str(round(suggested, 2))),
+            "min_price": summary["min_price"],
+            "max_price": summary["max_price"],
+            "average_price": summary["average_price"],
+            "median_price": summary["median_price"],
+            "suggested_price": summary["suggested_price"],
             "total_listings": len(prices),
         }
+    
+    @staticmethod
+    @timed(PHASE_PRICING)
+    def summarize(
+        prices: list[Decimal],
+        conditions: Optional[list[str]] = None,
+        trim_outliers: Optional[bool] = None,
+    ) -> Optional[dict]:
+        """Full statistics (percentiles, per-condition breakdown) plus the suggested price."""
+        return PriceSuggestionService.summarize_cents(
+            [price_stats.to_cents(price) for price in prices],
+            conditions=conditions,
+            trim_outliers=trim_outliers,
+        )
+    
+    @staticmethod
+    @timed(PHASE_PRICING)
+    def summarize_cents(
+        cents,
+        conditions: Optional[list[str]] = None,
+        trim_outliers: Optional[bool] = None,
+    ) -> Optional[dict]:
+        """Same as ``summarize`` for prices already held as integer cents."""
+        if trim_outliers is None:
+            trim_outliers = settings.PRICE_STATS_TRIM_OUTLIERS
+        summary = price_stats.summarize_cents(
+            cents,
+            percentiles=settings.PRICE_STATS_PERCENTILES,
+            trim_outliers=trim_outliers,
+            conditions=conditions,
+        )
+        if summary is not None:
+            summary["suggested_price"] = PriceSuggestionService.suggest(
+                summary["median_price"], summary["min_price"], summary["max_price"]
+            )
+        return summary
+    
+    @staticmethod
+    def suggest(median_price: Decimal, min_price: Decimal, max_price: Decimal) -> Decimal:
+        # Price 5% below median for competitive edge
+        suggested = median_price * Decimal("0.95")
+        if suggested < min_price:
+            suggested = min_price
+        if suggested > max_price * Decimal("0.9"):
+            suggested = max_price * Decimal("0.9")
+        return suggested.quantize(price_stats.CENT, ROUND_HALF_UP)
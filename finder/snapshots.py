@@ -0,0 +1,177 @@
+"""
+Append-only price history aggregated per keyword.
+
+Every search adds its aggregate (count, min, max, sum, quartiles, suggested
+price; all in integer cents) to the hourly bucket for its keyword. Old
+hourly buckets are folded into daily ones and old daily buckets into weekly
+ones by ``manage.py compact_price_snapshots``. Merged quartiles and
+suggested prices are listing-weighted means of the merged buckets, so they
+are approximations once more than one search has been folded together.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import price_stats
+from .models import PriceSnapshot
+from .search_cache import normalize_keywords
+from .services import PriceSuggestionService, is_demo_listing
+
+WEIGHTED_FIELDS = ('p25_cents', 'median_cents', 'p75_cents', 'suggested_cents')
+
+
+def bucket_start(moment: datetime, resolution: str) -> datetime:
+    """Truncate ``moment`` to the start of its hour, day or (Monday-based) week."""
+    moment = moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if resolution == PriceSnapshot.RESOLUTION_HOUR:
+        return moment
+    moment = moment.replace(hour=0)
+    if resolution == PriceSnapshot.RESOLUTION_WEEK:
+        moment -= timedelta(days=moment.weekday())
+    return moment
+
+
+def record_snapshot(keywords: str, listings: Iterable, at: Optional[datetime] = None) -> None:
+    """
+    Fold one search's prices into the hourly snapshot for its keyword.
+
+    ``listings`` are ``Listing`` records or ``SearchResult`` rows. Generated
+    demo listings are not market data and are left out; once folded into a
+    bucket they could never be separated again.
+    """
+    cents = [
+        price_stats.to_cents(listing.price) for listing in listings
+        if not is_demo_listing(listing.item_id)
+    ]
+    summary = price_stats.summarize_cents(cents, percentiles=(25, 75))
+    if summary is None:
+        return
+
+    suggested = PriceSuggestionService.suggest(
+        summary['median_price'], summary['min_price'], summary['max_price']
+    )
+    stats = {
+        'samples': 1,
+        'listings': len(cents),
+        'min_cents': min(cents),
+        'max_cents': max(cents),
+        'sum_cents': sum(cents),
+        'p25_cents': price_stats.to_cents(summary['percentiles'][25]),
+        'median_cents': price_stats.to_cents(summary['median_price']),
+        'p75_cents': price_stats.to_cents(summary['percentiles'][75]),
+        'suggested_cents': price_stats.to_cents(suggested),
+    }
+    _merge_into_bucket(
+        normalize_keywords(keywords)[:255],
+        PriceSnapshot.RESOLUTION_HOUR,
+        bucket_start(at or timezone.now(), PriceSnapshot.RESOLUTION_HOUR),
+        stats,
+    )
+
+
+def _row_stats(row: PriceSnapshot) -> dict:
+    return {
+        'samples': row.samples,
+        'listings': row.listings,
+        'min_cents': row.min_cents,
+        'max_cents': row.max_cents,
+        'sum_cents': row.sum_cents,
+        **{field: getattr(row, field) for field in WEIGHTED_FIELDS},
+    }
+
+
+def _combine(left: dict, right: dict) -> dict:
+    listings = left['listings'] + right['listings']
+    combined = {
+        'samples': left['samples'] + right['samples'],
+        'listings': listings,
+        'min_cents': min(left['min_cents'], right['min_cents']),
+        'max_cents': max(left['max_cents'], right['max_cents']),
+        'sum_cents': left['sum_cents'] + right['sum_cents'],
+    }
+    for field in WEIGHTED_FIELDS:
+        weighted = left[field] * left['listings'] + right[field] * right['listings']
+        combined[field] = round(weighted / listings) if listings else 0
+    return combined
+
+
+def _merge_into_bucket(keyword: str, resolution: str, start: datetime, stats: dict) -> None:
+    lookup = {'keyword': keyword, 'resolution': resolution, 'bucket_start': start}
+    with transaction.atomic():
+        row = PriceSnapshot.objects.select_for_update().filter(**lookup).first()
+        if row is None:
+            try:
+                with transaction.atomic():
+                    PriceSnapshot.objects.create(**lookup, **stats)
+                return
+            except IntegrityError:
+                # Another writer created the bucket first; merge into it.
+                row = PriceSnapshot.objects.select_for_update().get(**lookup)
+
+        for field, value in _combine(_row_stats(row), stats).items():
+            setattr(row, field, value)
+        row.save()
+
+
+def downsample(now: Optional[datetime] = None) -> dict:
+    """
+    Fold hourly rows older than ``PRICE_SNAPSHOT_HOURLY_DAYS`` into daily rows
+    and daily rows older than ``PRICE_SNAPSHOT_DAILY_DAYS`` into weekly rows.
+
+    Returns the number of source rows folded per resolution.
+    """
+    now = now or timezone.now()
+    plan = (
+        (PriceSnapshot.RESOLUTION_HOUR, PriceSnapshot.RESOLUTION_DAY, settings.PRICE_SNAPSHOT_HOURLY_DAYS),
+        (PriceSnapshot.RESOLUTION_DAY, PriceSnapshot.RESOLUTION_WEEK, settings.PRICE_SNAPSHOT_DAILY_DAYS),
+    )
+    folded = {}
+    for source, target, days in plan:
+        # Only fold whole target buckets so a bucket is never split across runs.
+        cutoff = bucket_start(now - timedelta(days=days), target)
+        rows = (
+            PriceSnapshot.objects.filter(resolution=source, bucket_start__lt=cutoff)
+            .order_by('keyword', 'bucket_start')
+        )
+
+        with transaction.atomic():
+            groups: dict[tuple[str, datetime], dict] = {}
+            count = 0
+            for row in rows.iterator(chunk_size=2000):
+                key = (row.keyword, bucket_start(row.bucket_start, target))
+                stats = _row_stats(row)
+                groups[key] = _combine(groups[key], stats) if key in groups else stats
+                count += 1
+
+            for (keyword, start), stats in groups.items():
+                _merge_into_bucket(keyword, target, start, stats)
+            rows.delete()
+        folded[source] = count
+    return folded
+
+
+def trend(keyword: str, since: Optional[datetime] = None) -> list[dict]:
+    """Return the stored history for ``keyword`` as a list of points, oldest first."""
+    rows = PriceSnapshot.objects.filter(keyword=normalize_keywords(keyword)[:255])
+    if since is not None:
+        rows = rows.filter(bucket_start__gte=bucket_start(since, PriceSnapshot.RESOLUTION_WEEK))
+    fields = ('resolution', 'bucket_start', 'samples', 'listings', 'min_cents', 'max_cents', 'sum_cents') + WEIGHTED_FIELDS
+    return [
+        {
+            'time': values['bucket_start'].isoformat(),
+            'resolution': values['resolution'],
+            'samples': values['samples'],
+            'listings': values['listings'],
+            'min_price': values['min_cents'] / 100,
+            'max_price': values['max_cents'] / 100,
+            'average_price': round(values['sum_cents'] / values['listings'] / 100, 2) if values['listings'] else 0,
+            'p25_price': values['p25_cents'] / 100,
+            'median_price': values['median_cents'] / 100,
+            'p75_price': values['p75_cents'] / 100,
+            'suggested_price': values['suggested_cents'] / 100,
+        }
+        for values in rows.order_by('bucket_start').values(*fields)
+    ]
@@ -0,0 +1,534 @@
+import base64
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .coalesce import SingleFlight, acquire_lock, is_locked, release_lock
+from .jobs import CLAIM_LOCK_KEY, claim_job, enqueue_search_job
+from .listings import Listing
+from .models import ListingProduct, PriceSnapshot, PriceSuggestion, ProductImage, SearchJob, SearchLock
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, paginate
+from .ratelimit import PRIORITY_BATCH, PRIORITY_INTERACTIVE, RateLimiter, RateLimitExceeded
+from .search_cache import SearchCache
+from .services import EbayAPIService
+from .snapshots import record_snapshot
+from .transport import EbayTransport
+from .views import PRODUCT_ORDERING, _refresh_results, _store_results
+
+
+def _make_products(count: int) -> list[ListingProduct]:
+    now = timezone.now()
+    products = []
+    for i in range(count):
+        product = ListingProduct.objects.create(
+            title=f"Product {i}", price='10.00', condition=ListingProduct.CONDITION_NEW, category_id='1',
+        )
+        # Pairs share a timestamp, so pages must break ties on pk.
+        ListingProduct.objects.filter(pk=product.pk).update(created_at=now - timedelta(minutes=i // 2))
+        products.append(product)
+    return products
+
+
+class CursorTests(TestCase):
+
+    def test_round_trip(self):
+        moment = timezone.now()
+        values = decode_cursor(encode_cursor([moment.isoformat(), 7]), 2)
+        self.assertEqual(values, [moment.isoformat(), 7])
+
+    def test_rejects_garbage(self):
+        for cursor in ('!!!', 'not base64 at all', base64.urlsafe_b64encode(b'{not json').decode()):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(cursor, 2)
+
+    def test_rejects_wrong_shape(self):
+        for values in ([1], [1, 2, 3], {'a': 1}):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            with self.subTest(values=values), self.assertRaises(InvalidCursor):
+                decode_cursor(cursor, 2)
+
+    def test_rejects_values_the_fields_cannot_parse(self):
+        with self.assertRaises(InvalidCursor):
+            paginate(ListingProduct.objects.all(), PRODUCT_ORDERING, cursor=encode_cursor(['yesterday', 'x']))
+
+    def test_pages_cover_every_row_once(self):
+        products = _make_products(7)
+        seen = []
+        cursor = None
+        while True:
+            page = paginate(ListingProduct.objects.all(), PRODUCT_ORDERING, cursor=cursor, page_size=3)
+            seen.extend(product.pk for product in page.items)
+            if not page.has_more:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(sorted(seen), sorted(product.pk for product in products))
+        self.assertEqual(len(seen), len(set(seen)))
+
+
+class ProductsApiCursorTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('tester', password='unused-password')
+        self.client.force_login(user)
+        _make_products(3)
+
+    def test_malformed_cursor_is_400(self):
+        response = self.client.get(reverse('finder:api_products'), {'cursor': '%%%'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+    def test_tampered_cursor_is_400(self):
+        page = paginate(ListingProduct.objects.all(), PRODUCT_ORDERING, page_size=1)
+        created_at, pk = decode_cursor(page.next_cursor, 2)
+        for values in ([created_at, 'abc'], ['not-a-date', pk], [created_at]):
+            with self.subTest(values=values):
+                response = self.client.get(reverse('finder:api_products'), {'cursor': encode_cursor(values)})
+                self.assertEqual(response.status_code, 400)
+
+    def test_next_cursor_continues_the_listing(self):
+        response = self.client.get(reverse('finder:api_products'), {'limit': 2})
+        self.assertEqual(response.json()['count'], 2)
+        response = self.client.get(reverse('finder:api_products'), {'cursor': response.json()['next_cursor']})
+        self.assertEqual(response.json()['count'], 1)
+        self.assertIsNone(response.json()['next_cursor'])
+
+
+class FakeClock:
+    """Stands in for the ``time`` module so bucket refills are deterministic."""
+
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+        self.slept = 0.0
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept += seconds
+        self.now += seconds
+
+
+class RateLimiterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmpdir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.clock = FakeClock()
+        patcher = mock.patch('finder.ratelimit.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def limiter(self, **kwargs) -> RateLimiter:
+        return RateLimiter(self.tmpdir / 'ratelimit.sqlite3', **kwargs)
+
+    def drain(self, limiter: RateLimiter, priority: str = PRIORITY_INTERACTIVE) -> int:
+        taken = 0
+        while True:
+            try:
+                limiter.acquire(priority, max_wait=0)
+            except RateLimitExceeded:
+                return taken
+            taken += 1
+
+    def test_burst_then_refill(self):
+        limiter = self.limiter(rate=2.0, burst=4)
+        self.assertEqual(self.drain(limiter), 4)
+
+        with self.assertRaises(RateLimitExceeded) as caught:
+            limiter.acquire(max_wait=0)
+        self.assertAlmostEqual(caught.exception.retry_after, 0.5)
+
+        self.clock.now += 1.0
+        self.assertEqual(self.drain(limiter), 2)
+
+    def test_refill_is_capped_at_burst(self):
+        limiter = self.limiter(rate=5.0, burst=3)
+        self.drain(limiter)
+        self.clock.now += 3600
+        self.assertEqual(self.drain(limiter), 3)
+
+    def test_acquire_waits_for_a_token_within_max_wait(self):
+        limiter = self.limiter(rate=1.0, burst=1)
+        limiter.acquire()
+        limiter.acquire(max_wait=5)
+        self.assertAlmostEqual(self.clock.slept, 1.0)
+
+    def test_batch_leaves_the_reserve_to_interactive(self):
+        limiter = self.limiter(rate=1.0, burst=10, batch_reserve=0.2)
+        self.assertEqual(self.drain(limiter, PRIORITY_BATCH), 8)
+        self.assertEqual(self.drain(limiter, PRIORITY_INTERACTIVE), 2)
+
+    def test_daily_quota_reserve(self):
+        limiter = self.limiter(rate=1000.0, burst=1000, daily_quota=10, batch_reserve=0.2)
+        self.assertEqual(self.drain(limiter, PRIORITY_BATCH), 8)
+        self.assertEqual(self.drain(limiter, PRIORITY_INTERACTIVE), 2)
+
+        with self.assertRaises(RateLimitExceeded) as caught:
+            limiter.acquire(max_wait=3600)
+        self.assertGreater(caught.exception.retry_after, 0)
+        status = limiter.status()
+        self.assertEqual(status['used_by_priority'], {PRIORITY_INTERACTIVE: 2, PRIORITY_BATCH: 8})
+        self.assertEqual(status['remaining_today'], 0)
+
+    def test_limiters_on_one_file_share_the_bucket(self):
+        # Each worker process opens its own limiter on the same file.
+        first = self.limiter(rate=1.0, burst=2)
+        second = self.limiter(rate=1.0, burst=2)
+        first.acquire()
+        first.acquire()
+        with self.assertRaises(RateLimitExceeded):
+            second.acquire(max_wait=0)
+
+    def test_drain_blocks_calls_for_the_given_time(self):
+        limiter = self.limiter(rate=2.0, burst=4)
+        limiter.drain(3.0)
+        with self.assertRaises(RateLimitExceeded):
+            limiter.acquire(max_wait=2.9)
+        self.clock.now += 3.5
+        limiter.acquire(max_wait=0)
+
+
+def _wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for callers to queue up")
+        time.sleep(0.005)
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def run_concurrently(self, flight: SingleFlight, fn, followers: int = 4) -> list:
+        """Start a leader blocked inside ``fn`` and ``followers`` callers behind it."""
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(flight.do('key', fn))
+            except Exception as exc:
+                outcomes.append(exc)
+
+        threads = [threading.Thread(target=call) for _ in range(followers + 1)]
+        threads[0].start()
+        _wait_until(lambda: flight.stats.snapshot().get('flights') == 1)
+        for thread in threads[1:]:
+            thread.start()
+        _wait_until(lambda: flight.stats.snapshot().get('coalesced') == followers)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def test_followers_get_the_leaders_result(self):
+        result = ['listing']
+
+        def fetch():
+            self.calls += 1
+            self.release.wait()
+            return result
+
+        outcomes = self.run_concurrently(SingleFlight(), fetch)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(outcomes), 5)
+        for outcome in outcomes:
+            self.assertIs(outcome, result)
+
+    def test_followers_get_the_leaders_exception(self):
+        error = RuntimeError("eBay is down")
+
+        def fetch():
+            self.calls += 1
+            self.release.wait()
+            raise error
+
+        outcomes = self.run_concurrently(SingleFlight(), fetch)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(outcomes, [error] * 5)
+
+    def test_a_finished_call_is_not_reused(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do('key', lambda: 1), 1)
+        self.assertEqual(flight.do('key', lambda: 2), 2)
+
+
+class SearchLockTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+
+    def test_only_one_owner_at_a_time(self):
+        self.assertTrue(acquire_lock('search:a', ttl=30))
+        self.assertTrue(is_locked('search:a'))
+        SearchLock.objects.filter(key='search:a').update(owner='other-host:1:1')
+        self.assertFalse(acquire_lock('search:a', ttl=30))
+
+    def test_release_and_expiry_free_the_key(self):
+        self.assertTrue(acquire_lock('search:a', ttl=30))
+        release_lock('search:a')
+        self.assertFalse(is_locked('search:a'))
+
+        SearchLock.objects.create(
+            key='search:b', owner='other-host:1:1', expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertFalse(is_locked('search:b'))
+        self.assertTrue(acquire_lock('search:b', ttl=30))
+
+    def test_waiter_gets_the_lock_holders_result(self):
+        # The lock row and the shared cache entry stand in for a leader in
+        # another process; this process must wait for its result, not fetch.
+        key = 'search:remote'
+        SearchLock.objects.create(
+            key=key, owner='other-host:1:1', expires_at=timezone.now() + timedelta(seconds=30)
+        )
+        waiter = SearchCache(shared_alias='default', coalesce_across_processes=True, lock_timeout=5)
+        leader = SearchCache(shared_alias='default')
+        timer = threading.Timer(0.1, leader.set, (key, ['from the leader']))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        def fetch():
+            raise AssertionError("the waiter called eBay itself")
+
+        self.assertEqual(waiter.get_or_fetch(key, fetch), ['from the leader'])
+        self.assertEqual(waiter.stats.snapshot().get('coalesced_remote'), 1)
+
+
+@override_settings(SEARCH_JOB_MAX_RUNNING=2)
+class ClaimJobTests(TestCase):
+
+    def setUp(self):
+        for i in range(3):
+            enqueue_search_job(ProductImage.objects.create(detected_label=f"part {i}"))
+
+    def test_claims_stop_at_max_running(self):
+        first = claim_job('worker-a')
+        second = claim_job('worker-b')
+        self.assertNotEqual(first.pk, second.pk)
+        self.assertIsNone(claim_job('worker-c'))
+        self.assertEqual(SearchJob.objects.filter(status=SearchJob.STATUS_RUNNING).count(), 2)
+        self.assertEqual(SearchLock.objects.get(key=CLAIM_LOCK_KEY).owner, 'worker-c')
+
+    def test_expired_claims_do_not_count(self):
+        claim_job('worker-a')
+        claim_job('worker-b')
+        SearchJob.objects.filter(status=SearchJob.STATUS_RUNNING).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertIsNotNone(claim_job('worker-c'))
+
+
+def _listings(count: int, price_cents: int = 1000, prefix: str = 'v1|') -> list[Listing]:
+    return [
+        Listing(
+            f"{prefix}{i}", f"Listing {i}", "", price_cents + i * 100, "USD", "seller",
+            f"https://www.ebay.com/itm/{prefix}{i}", "", "New",
+        )
+        for i in range(count)
+    ]
+
+
+class SnapshotTests(TestCase):
+
+    def test_demo_results_are_not_recorded(self):
+        record_snapshot("oil filter", EbayAPIService()._get_demo_results("oil filter"))
+        self.assertFalse(PriceSnapshot.objects.exists())
+
+    def test_demo_listings_are_left_out(self):
+        demo = EbayAPIService()._get_demo_results("oil filter")
+        record_snapshot("oil filter", _listings(3) + demo)
+        snapshot = PriceSnapshot.objects.get()
+        self.assertEqual((snapshot.listings, snapshot.min_cents, snapshot.max_cents), (3, 1000, 1200))
+
+
+@override_settings(EBAY_APP_ID='app', EBAY_CERT_ID='cert')
+class RepriceCatalogTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.product = ListingProduct.objects.create(
+            title="Oil filter", price='20.00', condition=ListingProduct.CONDITION_NEW, category_id='1',
+        )
+
+    def reprice(self, results: list[Listing]) -> None:
+        with mock.patch.object(EbayAPIService, 'search_products', return_value=results):
+            call_command(
+                'reprice_catalog', rate=0, checkpoint=str(self.tmpdir / 'checkpoint.json'), stdout=io.StringIO(),
+            )
+        self.product.refresh_from_db()
+
+    @override_settings(EBAY_APP_ID='', EBAY_CERT_ID='')
+    def test_refuses_to_run_without_credentials(self):
+        with self.assertRaises(CommandError):
+            self.reprice(_listings(3))
+
+    def test_prices_from_market_listings(self):
+        self.reprice(_listings(3))
+        self.assertIsNotNone(self.product.suggested_price)
+        self.assertEqual(self.product.market_listings, 3)
+
+    def test_demo_results_leave_the_product_unpriced(self):
+        self.reprice(EbayAPIService()._get_demo_results("oil filter"))
+        self.assertIsNone(self.product.suggested_price)
+        self.assertIsNone(self.product.price_delta)
+        self.assertIsNone(self.product.repriced_at)
+
+
+class BatchSearchTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('tester', password='unused-password')
+        self.client.force_login(user)
+
+    def post(self, body: dict):
+        return self.client.post(
+            reverse('finder:api_search_batch'), json.dumps(body), content_type='application/json'
+        )
+
+    def test_runs_at_batch_priority_within_the_deadline(self):
+        services = []
+
+        def search_many(service, keywords_list, deadline=None):
+            services.append(service)
+            return {keywords: _listings(2) for keywords in keywords_list}
+
+        with mock.patch.object(EbayAPIService, 'search_many', autospec=True, side_effect=search_many):
+            response = self.post({'keywords': ['oil filter'], 'deadline': 5})
+        self.assertEqual(response.json()['results'][0]['status'], 'ok')
+        service = services[0]
+        self.assertEqual(service.priority, PRIORITY_BATCH)
+        self.assertLessEqual(service._max_wait(), 5)
+
+    def test_transport_caps_the_limiter_wait(self):
+        limiter = mock.Mock(max_wait={PRIORITY_BATCH: 60.0})
+        transport = EbayTransport(limiter=limiter)
+        transport.session = mock.Mock()
+        transport.session.request.return_value = mock.Mock(status_code=200)
+        transport.get('https://example.invalid/', priority=PRIORITY_BATCH, max_wait=25.0)
+        transport.get('https://example.invalid/', priority=PRIORITY_BATCH)
+        self.assertEqual(
+            limiter.acquire.call_args_list, [mock.call(PRIORITY_BATCH, 25.0), mock.call(PRIORITY_BATCH, 60.0)]
+        )
+
+    def test_entries_that_are_not_strings_get_an_error(self):
+        with mock.patch.object(
+            EbayAPIService, 'search_many', autospec=True,
+            side_effect=lambda service, keywords_list, deadline=None: {k: _listings(2) for k in keywords_list},
+        ) as search_many:
+            response = self.post({'keywords': ['oil filter', None, 5, {'q': 'oil'}, ['oil', 3], ['air', 'filter']]})
+        statuses = [result['status'] for result in response.json()['results']]
+        self.assertEqual(statuses, ['ok', 'error', 'error', 'error', 'error', 'ok'])
+        self.assertEqual(response.json()['results'][5]['keywords'], 'air filter')
+        self.assertEqual(sorted(search_many.call_args.args[1]), ['air filter', 'oil filter'])
+
+
+class RefreshResultsTests(TestCase):
+
+    def setUp(self):
+        self.image = ProductImage.objects.create(detected_label="oil filter")
+        self.listings = _listings(3)
+        _store_results(self.image, self.listings)
+
+    def refresh(self, listings: list[Listing]) -> dict:
+        return _refresh_results(self.image, listings, "oil filter")
+
+    def suggestion(self) -> PriceSuggestion:
+        return PriceSuggestion.objects.get(product_image=self.image)
+
+    def row(self, item_id: str):
+        return self.image.search_results.get(item_id=item_id)
+
+    def test_unchanged_prices_leave_the_suggestion_alone(self):
+        PriceSuggestion.objects.filter(product_image=self.image).update(suggested_price='1.00')
+        seen_before = self.row('v1|0').last_seen_at
+
+        self.assertEqual(self.refresh(self.listings), {'added': 0, 'updated': 0, 'ended': 0})
+        self.assertEqual(str(self.suggestion().suggested_price), '1.00')
+        self.assertGreater(self.row('v1|0').last_seen_at, seen_before)
+
+    def test_new_listing_is_inserted(self):
+        self.assertEqual(self.refresh(_listings(4)), {'added': 1, 'updated': 0, 'ended': 0})
+        self.assertEqual(self.image.search_results.count(), 4)
+        self.assertEqual(self.suggestion().total_listings, 4)
+
+    def test_changed_price_is_updated(self):
+        listings = list(self.listings)
+        listings[1] = listings[1]._replace(price_cents=5000)
+        self.assertEqual(self.refresh(listings), {'added': 0, 'updated': 1, 'ended': 0})
+        self.assertEqual(str(self.row('v1|1').price), '50.00')
+        self.assertEqual(str(self.suggestion().max_price), '50.00')
+
+    def test_missing_listing_is_ended_and_can_come_back(self):
+        self.assertEqual(self.refresh(self.listings[:2]), {'added': 0, 'updated': 0, 'ended': 1})
+        self.assertIsNotNone(self.row('v1|2').ended_at)
+        self.assertEqual(self.suggestion().total_listings, 2)
+
+        self.assertEqual(self.refresh(self.listings), {'added': 0, 'updated': 1, 'ended': 0})
+        self.assertIsNone(self.row('v1|2').ended_at)
+        self.assertEqual(self.suggestion().total_listings, 3)
+
+    def test_demo_fallback_leaves_stored_listings_alone(self):
+        user = get_user_model().objects.create_user('tester', password='unused-password')
+        self.client.force_login(user)
+        demo = EbayAPIService()._get_demo_results("oil filter")
+        with mock.patch.object(EbayAPIService, 'search_products', return_value=demo):
+            response = self.client.get(reverse('finder:refresh', args=[self.image.pk]), follow=True)
+
+        self.assertIn("eBay could not be reached", response.content.decode())
+        self.assertEqual(self.image.search_results.count(), 3)
+        self.assertFalse(self.image.search_results.filter(ended_at__isnull=False).exists())
+        self.assertEqual(self.suggestion().total_listings, 3)
+
+
+class DeepSearchCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = SearchCache(shared_alias=None)
+        self.failing = {400}
+        self.service = EbayAPIService()
+        for patcher in (
+            mock.patch('finder.services.get_search_cache', return_value=self.cache),
+            mock.patch.object(EbayAPIService, 'access_token', new_callable=mock.PropertyMock, return_value='token'),
+            mock.patch.object(EbayAPIService, '_fetch_page', autospec=True, side_effect=self.fetch_page),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fetch_page(self, service, keywords, limit, offset, category_id=None):
+        if offset in self.failing:
+            raise requests.ConnectionError("page lost")
+        items = [
+            {'itemId': f'v1|{offset + i}', 'price': {'value': '10.00', 'currency': 'USD'}}
+            for i in range(limit)
+        ]
+        return {'total': 600, 'itemSummaries': items}
+
+    def test_a_search_missing_pages_is_not_cached(self):
+        self.assertEqual(len(self.service.deep_search("oil", max_items=600)), 400)
+        self.assertEqual(len(self.cache.local), 0)
+
+        self.failing = set()
+        self.assertEqual(len(self.service.deep_search("oil", max_items=600)), 600)
+        self.assertEqual(len(self.cache.local), 1)
@@ -0,0 +1,178 @@
+"""
+Per-request phase timing.
+
+``ServerTimingMiddleware`` starts a ``RequestTimer`` for each request in a
+context variable. Code wrapped in ``phase(name)`` (or decorated with
+``timed(name)``) adds its duration to that timer; outside a request, or on
+a thread the request did not start on, the wrappers do nothing beyond one
+context-variable lookup. Phases nest, and each phase is charged only for
+its own time: an ORM query issued while a template renders counts towards
+``db``, not ``template``. Whatever no phase claimed is reported as ``app``.
+
+At the end of the request the phases become a ``Server-Timing`` header and
+are observed into the histograms rendered by the metrics endpoint.
+"""
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from django.template.backends.django import DjangoTemplates
+
+from .metrics import Histogram
+
+PHASE_EBAY = 'ebay'
+PHASE_EBAY_OAUTH = 'ebay_oauth'
+PHASE_VISION = 'vision'
+PHASE_PRICING = 'pricing'
+PHASE_DB = 'db'
+PHASE_TEMPLATE = 'template'
+PHASE_APP = 'app'
+
+REQUEST_SECONDS = Histogram(
+    'finder_request_duration_seconds', "Time to produce a response, by view.", ('view',)
+)
+PHASE_SECONDS = Histogram(
+    'finder_request_phase_seconds',
+    "Time per request spent in each phase, excluding nested phases, by view.",
+    ('view', 'phase'),
+)
+
+_current: ContextVar[Optional['RequestTimer']] = ContextVar('finder_request_timer', default=None)
+
+
+class RequestTimer:
+    """Accumulated seconds and call counts per phase for one request."""
+
+    __slots__ = ('started', 'thread', 'seconds', 'calls', '_open')
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.thread = threading.get_ident()
+        self.seconds: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+        # [name, seconds spent in child phases] per open phase, innermost last.
+        self._open: list[list] = []
+
+    def add(self, name: str, seconds: float, calls: int = 1) -> None:
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    def finish(self) -> float:
+        """Return the request's total time and charge the unclaimed part to ``app``."""
+        total = time.perf_counter() - self.started
+        self.seconds[PHASE_APP] = max(total - sum(self.seconds.values()), 0.0)
+        self.calls[PHASE_APP] = 1
+        return total
+
+    def header(self, total: float) -> str:
+        entries = []
+        for name, seconds in sorted(self.seconds.items(), key=lambda item: -item[1]):
+            entry = f"{name};dur={seconds * 1000:.1f}"
+            if name != PHASE_APP:
+                calls = self.calls[name]
+                singular, plural = ('query', 'queries') if name == PHASE_DB else ('call', 'calls')
+                entry += f';desc="{calls} {singular if calls == 1 else plural}"'
+            entries.append(entry)
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+    def observe(self, view: str, total: float) -> None:
+        REQUEST_SECONDS.observe(total, view)
+        for name, seconds in self.seconds.items():
+            PHASE_SECONDS.observe(seconds, view, name)
+
+
+def start_request() -> tuple[RequestTimer, object]:
+    timer = RequestTimer()
+    return timer, _current.set(timer)
+
+
+def end_request(token) -> None:
+    _current.reset(token)
+
+
+def _active_timer() -> Optional[RequestTimer]:
+    timer = _current.get()
+    if timer is not None and timer.thread != threading.get_ident():
+        return None
+    return timer
+
+
+class phase:
+    """Context manager charging the enclosed block to phase ``name``."""
+
+    __slots__ = ('name', 'timer', 'started')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> 'phase':
+        self.timer = _active_timer()
+        if self.timer is not None:
+            self.timer._open.append([self.name, 0.0])
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        timer = self.timer
+        if timer is None:
+            return
+        elapsed = time.perf_counter() - self.started
+        _, nested = timer._open.pop()
+        parent = timer._open[-1] if timer._open else None
+        # A call nested in the same phase (summarize -> summarize_cents) is
+        # part of the outer call, not another one.
+        timer.add(self.name, elapsed - nested, 0 if parent and parent[0] == self.name else 1)
+        if parent:
+            parent[1] += elapsed
+
+
+def timed(name: str) -> Callable:
+    """Decorator form of ``phase``."""
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def time_query(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` hook timing every ORM query as ``db``."""
+    if _current.get() is None:
+        return execute(sql, params, many, context)
+    with phase(PHASE_DB):
+        return execute(sql, params, many, context)
+
+
+def install_query_timer(sender, connection, **kwargs) -> None:
+    """``connection_created`` receiver adding ``time_query`` to each new connection."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The standard Django template backend with rendering timed as ``template``."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+class _TimedTemplate:
+    def __init__(self, template) -> None:
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with phase(PHASE_TEMPLATE):
+            return self.template.render(context, request)
@@ -0,0 +1,178 @@
+"""
+Process-wide OAuth token store shared by every EbayAPIService instance.
+
+Tokens are kept in memory and mirrored to a small JSON file so that all
+worker processes on the host reuse the same application token. Refreshes
+are serialized with a lock file; while one caller refreshes, everyone else
+keeps using the token that is still valid.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from django.conf import settings
+
+
+class _FileLock:
+    """Cross-process mutex based on exclusive creation of a lock file."""
+
+    def __init__(self, path: Path, stale_after: float = 30.0) -> None:
+        self.path = path
+        self.stale_after = stale_after
+
+    def acquire(self, blocking: bool = True, timeout: float = 10.0) -> bool:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return True
+            except FileExistsError:
+                self._break_if_stale()
+            if not blocking or time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def release(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _break_if_stale(self) -> None:
+        # A crashed holder must not block refreshes forever.
+        try:
+            if time.time() - os.path.getmtime(self.path) > self.stale_after:
+                os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class TokenStore:
+    """Expiry-aware token cache backed by a JSON file."""
+
+    def __init__(self, path, refresh_margin: int = 300, lock_timeout: float = 10.0) -> None:
+        self.path = Path(path)
+        self.refresh_margin = refresh_margin
+        self.lock_timeout = lock_timeout
+        self._file_lock = _FileLock(self.path.with_name(self.path.name + '.lock'))
+        self._mutex = threading.Lock()
+        self._memory: dict[str, dict] = {}
+
+    def get_token(self, key: str, fetch: Callable[[], Optional[dict]]) -> Optional[str]:
+        """
+        Return a token for ``key``, calling ``fetch`` only when a refresh is due.
+
+        ``fetch`` must return the token endpoint payload (``access_token`` and
+        ``expires_in``) or ``None`` on failure.
+        """
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is None or entry['refresh_at'] <= now:
+            entry = self._read(key) or entry
+            if entry is not None:
+                self._memory[key] = entry
+        if entry is not None and entry['refresh_at'] > now:
+            return entry['access_token']
+
+        current = entry if entry is not None and entry['expires_at'] > now else None
+        return self._refresh(key, fetch, current)
+
+    def clear(self) -> None:
+        with self._mutex:
+            self._memory.clear()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def _refresh(self, key: str, fetch, current: Optional[dict]) -> Optional[str]:
+        # With a still-valid token in hand nobody waits: whoever wins the
+        # locks refreshes, the rest return the current token.
+        blocking = current is None
+        if not self._mutex.acquire(blocking, self.lock_timeout if blocking else -1):
+            return current['access_token'] if current else None
+        try:
+            if not self._file_lock.acquire(blocking, self.lock_timeout):
+                return current['access_token'] if current else None
+            try:
+                entry = self._read(key)
+                if entry is not None and entry['refresh_at'] > time.time():
+                    self._memory[key] = entry
+                    return entry['access_token']
+
+                try:
+                    payload = fetch()
+                except Exception:
+                    # Keep serving a still-valid token if the refresh itself fails.
+                    if current is None:
+                        raise
+                    return current['access_token']
+                if not payload or not payload.get('access_token'):
+                    return current['access_token'] if current else None
+
+                entry = self._make_entry(payload)
+                self._memory[key] = entry
+                self._write(key, entry)
+                return entry['access_token']
+            finally:
+                self._file_lock.release()
+        finally:
+            self._mutex.release()
+
+    def _make_entry(self, payload: dict) -> dict:
+        now = time.time()
+        expires_in = int(payload.get('expires_in') or 0)
+        # Never refresh earlier than half-way through the token lifetime.
+        margin = min(self.refresh_margin, expires_in // 2)
+        return {
+            'access_token': payload['access_token'],
+            'expires_at': now + expires_in,
+            'refresh_at': now + expires_in - margin,
+        }
+
+    def _read_all(self) -> dict:
+        try:
+            with open(self.path, encoding='utf-8') as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _read(self, key: str) -> Optional[dict]:
+        entry = self._read_all().get(key)
+        if not isinstance(entry, dict) or 'access_token' not in entry:
+            return None
+        return entry
+
+    def _write(self, key: str, entry: dict) -> None:
+        data = self._read_all()
+        data[key] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        fd = os.open(tmp_path, os.O_CREAT | os.O_TRUNC | os.O_WRONLY, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh)
+        os.replace(tmp_path, self.path)
+
+
+_default_store: Optional[TokenStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_token_store() -> TokenStore:
+    """Return the process-wide token store configured from settings."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = TokenStore(
+                    settings.EBAY_TOKEN_CACHE_PATH,
+                    refresh_margin=settings.EBAY_TOKEN_REFRESH_MARGIN,
+                )
+    return _default_store
@@ -0,0 +1,150 @@
+"""
+Pooled keep-alive HTTP transport shared by all eBay API calls.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .metrics import Histogram
+from .ratelimit import PRIORITY_INTERACTIVE, RateLimiter, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+UPSTREAM_SECONDS = Histogram(
+    'finder_ebay_http_attempt_seconds', "Duration of each HTTP attempt to eBay, by call.", ('call',)
+)
+
+
+class EbayTransport:
+    """
+    A long-lived ``requests.Session`` with bounded timeouts and retries.
+
+    Retries cover connection errors, timeouts and 429/5xx responses, using
+    full-jitter exponential backoff that honours ``Retry-After`` up to
+    ``backoff_max``. Every attempt is timed in ``UPSTREAM_SECONDS`` and,
+    with a ``limiter``, first takes a token from the shared call budget.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.25,
+        backoff_max: float = 4.0,
+        limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = limiter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        name: Optional[str] = None,
+        priority: str = PRIORITY_INTERACTIVE,
+        max_wait: Optional[float] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Send a request, retrying transient failures within the retry budget.
+
+        Raises ``RateLimitExceeded`` when the call budget for ``priority``
+        is unavailable within its maximum wait, shortened to ``max_wait``
+        seconds when given.
+        """
+        name = name or method.lower()
+        kwargs.setdefault('timeout', self.timeout)
+
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                wait = self.limiter.max_wait[priority]
+                self.limiter.acquire(priority, wait if max_wait is None else min(wait, max_wait))
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                self._record(name, started, 'error')
+                if attempt >= self.max_retries:
+                    raise
+                logger.debug("%s failed (%s), retrying", name, exc)
+                delay = self._backoff(attempt)
+            else:
+                self._record(name, started, response.status_code)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response.headers.get('Retry-After'))
+                if response.status_code == 429 and self.limiter is not None:
+                    # Make every process back off, not just this caller.
+                    self.limiter.drain(delay)
+                response.close()
+
+            attempt += 1
+            time.sleep(delay)
+
+    def get(self, url: str, name: Optional[str] = None, **kwargs) -> requests.Response:
+        return self.request('GET', url, name=name, **kwargs)
+
+    def post(self, url: str, name: Optional[str] = None, **kwargs) -> requests.Response:
+        return self.request('POST', url, name=name, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _record(self, name: str, started: float, outcome) -> None:
+        elapsed = time.perf_counter() - started
+        UPSTREAM_SECONDS.observe(elapsed, name)
+        logger.debug("%s -> %s in %.1f ms", name, outcome, elapsed * 1000)
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+_transport: Optional[EbayTransport] = None
+_transport_pid: Optional[int] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> EbayTransport:
+    """Return the transport for this process, rebuilding it after a fork."""
+    global _transport, _transport_pid
+    pid = os.getpid()
+    if _transport is None or _transport_pid != pid:
+        with _transport_lock:
+            if _transport is None or _transport_pid != pid:
+                _transport = EbayTransport(
+                    pool_size=settings.EBAY_HTTP_POOL_SIZE,
+                    connect_timeout=settings.EBAY_HTTP_CONNECT_TIMEOUT,
+                    read_timeout=settings.EBAY_HTTP_READ_TIMEOUT,
+                    max_retries=settings.EBAY_HTTP_MAX_RETRIES,
+                    backoff_base=settings.EBAY_HTTP_BACKOFF_BASE,
+                    backoff_max=settings.EBAY_HTTP_BACKOFF_MAX,
+                    limiter=get_rate_limiter(),
+                )
+                _transport_pid = pid
+    return _transport
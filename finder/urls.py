@@ -8,10 +8,18 @@ urlpatterns = [
     path('add/', views.add_product, name='add_product'),
     path('products/', views.product_list, name='product_list'),
     path('products/<int:pk>/', views.product_detail, name='product_detail'),
+    path('api/products/', views.api_products, name='api_products'),
     path('accounts/guest/', views.guest_login, name='guest_login'),
     path('upload/', views.upload_image, name='upload'),
     path('search/', views.manual_search, name='manual_search'),
+    path('jobs/<int:pk>/', views.job_detail, name='job_detail'),
+    path('api/jobs/<int:pk>/', views.job_status, name='job_status'),
     path('results/<int:pk>/', views.results, name='results'),
+    path('api/results/<int:pk>/', views.api_results, name='api_results'),
     path('refresh/<int:pk>/', views.refresh_search, name='refresh'),
     path('api/search/', views.api_search, name='api_search'),
+    path('api/search/batch/', views.api_search_batch, name='api_search_batch'),
+    path('api/trend/', views.api_trend, name='api_trend'),
+    path('api/quota/', views.api_quota, name='api_quota'),
+    path('metrics', views.metrics, name='metrics'),
 ]
@@ -1,15 +1,49 @@
+import hmac
+import json
+import time
+from array import array
+from contextlib import closing
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
 from django.views.decorators.http import require_POST
-from decimal import Decimal
-
-from .models import ProductImage, SearchResult, PriceSuggestion, ListingProduct
+from datetime import timedelta
+from typing import Optional
+
+from . import recognition_cache
+from .db import use_replica
+from .jobs import enqueue_search_job
+from .listings import Listing
+from .metrics import counter_lines, render_prometheus
+from .pagination import InvalidCursor, paginate
+from .price_index import local_estimate
+from .ratelimit import PRIORITY_BATCH, RateLimitExceeded, get_rate_limiter
+from .search_cache import get_search_cache, normalize_keywords
+from .search_results import build_result_row
+from .snapshots import record_snapshot, trend
+from .models import ProductImage, SearchResult, PriceSuggestion, ListingProduct, SearchJob, condition_bucket
 from .forms import ImageUploadForm, ManualSearchForm, SignUpForm, ListingProductForm
-from .services import EbayAPIService, ImageRecognitionService, PriceSuggestionService
+from .services import EbayAPIService, ImageRecognitionService, PriceSuggestionService, is_demo_listing
+
+RATE_LIMITED_MESSAGE = 'The eBay call budget is used up right now. Please try again shortly.'
+EBAY_UNAVAILABLE_MESSAGE = 'eBay could not be reached, so the stored listings were left as they were.'
+
+# Stored listings returned with an api_search answered from the local index.
+LOCAL_RESULTS_LIMIT = 50
+
+PRODUCT_ORDERING = ('-created_at', '-pk')
+RESULT_ORDERING = ('price', 'pk')
 
 
 @login_required
@@ -35,16 +69,18 @@ def upload_image(request):
     if form.is_valid():
         product_image = form.save()
         
-        recognition_service = ImageRecognitionService()
-        detected_label, detected_labels, web_label = recognition_service.recognize_product(
-            product_image.image.path
-        )
-        product_image.detected_label = detected_label
-        product_image.detected_labels = ", ".join(detected_labels)
-        product_image.save()
-
-        search_keywords = web_label or detected_label
-        _perform_search(product_image, search_keywords)
+        if settings.SEARCH_JOBS_ASYNC:
+            job = enqueue_search_job(product_image)
+            if request.headers.get('Accept') == 'application/json':
+                return JsonResponse(_job_payload(job), status=202)
+            messages.info(request, 'Image uploaded! Recognition and search are running in the background.')
+            return redirect('finder:job_detail', pk=job.pk)
+        
+        try:
+            detected_label = _recognize_and_search(product_image)
+        except RateLimitExceeded:
+            messages.error(request, RATE_LIMITED_MESSAGE)
+            return redirect('finder:results', pk=product_image.pk)
         
         messages.success(request, f'Image uploaded! Detected: "{detected_label}"')
         return redirect('finder:results', pk=product_image.pk)
@@ -53,6 +89,57 @@ def upload_image(request):
     return redirect('finder:home')
 
 
+def _recognize_and_search(product_image: ProductImage) -> str:
+    """Label an uploaded image with Vision and run the eBay search for it."""
+    
+    recognition_service = ImageRecognitionService()
+    detected_label, detected_labels, web_label = recognition_service.recognize_product(
+        product_image.image.path
+    )
+    product_image.detected_label = detected_label
+    product_image.detected_labels = ", ".join(detected_labels)
+    product_image.save()
+
+    search_keywords = web_label or detected_label
+    _perform_search(product_image, search_keywords)
+    return detected_label
+
+
+@login_required
+def job_detail(request, pk):
+    
+    job = get_object_or_404(SearchJob.objects.select_related('product_image'), pk=pk)
+    if job.status == SearchJob.STATUS_DONE:
+        return redirect('finder:results', pk=job.product_image_id)
+    
+    return render(request, 'finder/job.html', {
+        'job': job,
+        'product_image': job.product_image,
+    })
+
+
+@login_required
+def job_status(request, pk):
+    
+    job = get_object_or_404(SearchJob, pk=pk)
+    return JsonResponse(_job_payload(job))
+
+
+def _job_payload(job: SearchJob) -> dict:
+    payload = {
+        'id': job.pk,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'error': job.error,
+        'status_url': reverse('finder:job_status', kwargs={'pk': job.pk}),
+        'results_url': None,
+    }
+    if job.status == SearchJob.STATUS_DONE:
+        payload['results_url'] = reverse('finder:results', kwargs={'pk': job.product_image_id})
+    return payload
+
+
 @login_required
 @require_POST
 def manual_search(request):
@@ -66,7 +153,12 @@ def manual_search(request):
             detected_label=keywords
         )
         
-        _perform_search(product_image, keywords)
+        try:
+            _perform_search(product_image, keywords)
+        except RateLimitExceeded:
+            product_image.delete()
+            messages.error(request, RATE_LIMITED_MESSAGE)
+            return redirect('finder:home')
         
         messages.success(request, f'Search completed for: "{keywords}"')
         return redirect('finder:results', pk=product_image.pk)
@@ -79,43 +171,167 @@ def manual_search(request):
 def results(request, pk):
     
     product_image = get_object_or_404(ProductImage, pk=pk)
-    search_results = product_image.search_results.all()
+    search_results = product_image.search_results.filter(ended_at__isnull=True)
     
     try:
         price_suggestion = product_image.price_suggestion
     except PriceSuggestion.DoesNotExist:
         price_suggestion = None
     
-    new_items = search_results.filter(condition__icontains='new')
-    used_items = search_results.exclude(condition__icontains='new')
+    condition_counts = search_results.aggregate(
+        total=Count('pk'),
+        **{
+            bucket: Count('pk', filter=Q(condition_bucket=bucket))
+            for bucket, _ in SearchResult.CONDITION_BUCKET_CHOICES
+        },
+    )
+    
+    page = paginate(search_results, RESULT_ORDERING, page_size=settings.PAGE_SIZE)
     
     return render(request, 'finder/results.html', {
         'product_image': product_image,
-        'search_results': search_results,
-        'new_items': new_items,
-        'used_items': used_items,
+        'search_results': page.items,
+        'next_cursor': page.next_cursor,
+        'condition_counts': condition_counts,
         'price_suggestion': price_suggestion,
     })
 
 
 @login_required
-def refresh_search(request, pk):
+def api_results(request, pk):
     
     product_image = get_object_or_404(ProductImage, pk=pk)
+    search_results = product_image.search_results.filter(ended_at__isnull=True)
+    
+    bucket = request.GET.get('bucket')
+    if bucket:
+        if bucket not in dict(SearchResult.CONDITION_BUCKET_CHOICES):
+            return JsonResponse({'error': 'Unknown condition bucket'}, status=400)
+        search_results = search_results.filter(condition_bucket=bucket)
     
-    product_image.search_results.all().delete()
     try:
-        product_image.price_suggestion.delete()
-    except PriceSuggestion.DoesNotExist:
-        pass
+        page = paginate(
+            search_results, RESULT_ORDERING,
+            cursor=request.GET.get('cursor'), page_size=_page_size(request),
+        )
+    except InvalidCursor as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    
+    return JsonResponse({
+        'html': render_to_string(
+            'finder/_result_cards.html', {'search_results': page.items}, request=request
+        ),
+        'count': len(page.items),
+        'next_cursor': page.next_cursor,
+    })
+
+
+@login_required
+def refresh_search(request, pk):
+    
+    product_image = get_object_or_404(ProductImage, pk=pk)
     
     keywords = product_image.detected_label or "product"
-    _perform_search(product_image, keywords)
+    try:
+        results = EbayAPIService().search_products(keywords, use_cache=False)
+    except RateLimitExceeded:
+        messages.error(request, RATE_LIMITED_MESSAGE)
+        return redirect('finder:results', pk=pk)
+    # Demo listings mean the search fell back after an eBay error; applying
+    # them would end every real listing.
+    if any(is_demo_listing(item.item_id) for item in results):
+        messages.error(request, EBAY_UNAVAILABLE_MESSAGE)
+        return redirect('finder:results', pk=pk)
+    changes = _refresh_results(product_image, results, keywords)
     
-    messages.success(request, 'Search refreshed successfully!')
+    messages.success(
+        request,
+        f"Search refreshed: {changes['added']} new, {changes['updated']} updated, "
+        f"{changes['ended']} ended listing(s)."
+    )
     return redirect('finder:results', pk=pk)
 
 
+def _refresh_results(product_image: ProductImage, results: list[Listing], keywords: str) -> dict:
+    """
+    Apply a fresh result set to stored listings as an incremental upsert.
+
+    Listings are matched on eBay item id, falling back to ``item_url``. New
+    listings are inserted, changed prices or conditions are updated, and
+    listings missing from ``results`` are marked ended. The price suggestion
+    is only recomputed when the set of active prices changed.
+    """
+    
+    stored = list(product_image.search_results.all())
+    by_id = {row.item_id: row for row in stored if row.item_id}
+    by_url = {row.item_url: row for row in stored}
+    
+    now = timezone.now()
+    new_rows = []
+    new_keys = set()
+    changed_rows = []
+    seen = set()
+    prices_changed = False
+    for item in results:
+        row = by_id.get(item.item_id) or by_url.get(item.item_url)
+        if row is None:
+            key = item.item_id or item.item_url
+            if key not in new_keys:
+                new_keys.add(key)
+                new_rows.append(build_result_row(product_image, item, now))
+                prices_changed = True
+            continue
+        if row.pk in seen:
+            continue
+        seen.add(row.pk)
+        
+        price = item.price
+        if row.price != price or row.condition != item.condition or row.ended_at:
+            prices_changed = prices_changed or row.price != price or row.ended_at is not None
+            row.price = price
+            row.condition = item.condition
+            row.condition_bucket = condition_bucket(item.condition)
+            row.item_id = row.item_id or item.item_id
+            row.ended_at = None
+            changed_rows.append(row)
+    
+    seen_ids = list(seen)
+    ended_ids = [row.pk for row in stored if row.pk not in seen and row.ended_at is None]
+    prices_changed = prices_changed or bool(ended_ids)
+    
+    with transaction.atomic():
+        SearchResult.objects.bulk_create(new_rows, batch_size=settings.SEARCH_RESULT_BATCH_SIZE)
+        SearchResult.objects.bulk_update(
+            changed_rows, ['price', 'condition', 'condition_bucket', 'item_id', 'ended_at'],
+            batch_size=settings.SEARCH_RESULT_BATCH_SIZE,
+        )
+        for offset in range(0, len(seen_ids), settings.SEARCH_RESULT_BATCH_SIZE):
+            SearchResult.objects.filter(
+                pk__in=seen_ids[offset:offset + settings.SEARCH_RESULT_BATCH_SIZE]
+            ).update(last_seen_at=now)
+        for offset in range(0, len(ended_ids), settings.SEARCH_RESULT_BATCH_SIZE):
+            SearchResult.objects.filter(
+                pk__in=ended_ids[offset:offset + settings.SEARCH_RESULT_BATCH_SIZE]
+            ).update(ended_at=now)
+        
+        if prices_changed:
+            active_prices = list(
+                product_image.search_results.filter(ended_at__isnull=True)
+                .values_list('price', flat=True)
+            )
+            if active_prices:
+                PriceSuggestion.objects.update_or_create(
+                    product_image=product_image,
+                    defaults=PriceSuggestionService.calculate_suggestion(active_prices),
+                )
+            else:
+                PriceSuggestion.objects.filter(product_image=product_image).delete()
+        if results:
+            record_snapshot(keywords, results)
+    
+    return {'added': len(new_rows), 'updated': len(changed_rows), 'ended': len(ended_ids)}
+
+
 @login_required
 def add_product(request):
 
@@ -138,15 +354,47 @@ def add_product(request):
 
 
 @login_required
+@use_replica
 def product_list(request):
 
-    products = ListingProduct.objects.all()
+    page = paginate(ListingProduct.objects.all(), PRODUCT_ORDERING, page_size=settings.PAGE_SIZE)
 
     return render(request, 'finder/products.html', {
-        'products': products,
+        'products': page.items,
+        'next_cursor': page.next_cursor,
+        'total_products': ListingProduct.objects.count(),
+    })
+
+
+@login_required
+@use_replica
+def api_products(request):
+
+    try:
+        page = paginate(
+            ListingProduct.objects.all(), PRODUCT_ORDERING,
+            cursor=request.GET.get('cursor'), page_size=_page_size(request),
+        )
+    except InvalidCursor as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    return JsonResponse({
+        'html': render_to_string(
+            'finder/_product_cards.html', {'products': page.items}, request=request
+        ),
+        'count': len(page.items),
+        'next_cursor': page.next_cursor,
     })
 
 
+def _page_size(request) -> int:
+    try:
+        size = int(request.GET.get('limit', settings.PAGE_SIZE))
+    except ValueError:
+        size = settings.PAGE_SIZE
+    return min(max(size, 1), settings.PAGE_SIZE_MAX)
+
+
 @login_required
 def product_detail(request, pk):
 
@@ -157,33 +405,48 @@ def product_detail(request, pk):
     })
 
 
-def _perform_search(product_image: ProductImage, keywords: str) -> None:
+def _perform_search(
+    product_image: ProductImage,
+    keywords: str,
+    use_cache: bool = True,
+) -> None:
     
-    ebay_service = EbayAPIService()
-    results = ebay_service.search_products(keywords)
+    results = EbayAPIService().search_products(keywords, use_cache=use_cache)
     
-    prices = []
+    _store_results(product_image, results, keywords=keywords)
+
+
+def _store_results(
+    product_image: ProductImage,
+    results: list[Listing],
+    batch_size: Optional[int] = None,
+    keywords: Optional[str] = None,
+) -> None:
+    """
+    Write a result set and its price suggestion in one atomic, batched write.
+
+    The set replaces any results already stored for ``product_image``, so a
+    search job that runs twice (re-claimed after its visibility timeout)
+    leaves one copy. With ``keywords`` the search is also added to the
+    price history.
+    """
     
-    for item in results:
-        SearchResult.objects.create(
-            product_image=product_image,
-            title=item['title'],
-            price=item['price'],
-            currency=item['currency'],
-            seller_name=item['seller'],
-            item_url=item['item_url'],
-            image_url=item['image_url'],
-            condition=item['condition'],
-            description=item.get('description', ''),
-        )
-        prices.append(item['price'])
+    now = timezone.now()
+    rows = [build_result_row(product_image, item, now) for item in results]
+    if not rows:
+        return
     
-    if prices:
-        suggestion_data = PriceSuggestionService.calculate_suggestion(prices)
-        PriceSuggestion.objects.create(
+    with transaction.atomic():
+        SearchResult.objects.filter(product_image=product_image).delete()
+        SearchResult.objects.bulk_create(
+            rows, batch_size=batch_size or settings.SEARCH_RESULT_BATCH_SIZE
+        )
+        PriceSuggestion.objects.update_or_create(
             product_image=product_image,
-            **suggestion_data
+            defaults=PriceSuggestionService.calculate_suggestion([row.price for row in rows]),
         )
+        if keywords:
+            record_snapshot(keywords, rows)
 
 
 @login_required
@@ -194,33 +457,276 @@ def api_search(request):
     if not keywords:
         return JsonResponse({'error': 'Keywords required'}, status=400)
     
+    deep = request.GET.get('deep') == '1'
+    # Capped so one request cannot fan out into an unbounded number of
+    # eBay calls or cache keys.
+    try:
+        max_items = min(max(int(request.GET.get('max_items', '')), 1), settings.EBAY_DEEP_SEARCH_MAX_ITEMS)
+    except ValueError:
+        max_items = None
+    
     ebay_service = EbayAPIService()
-    results = ebay_service.search_products(keywords)
+    if request.GET.get('stream') == '1':
+        if not deep:
+            max_items = 50
+        response = StreamingHttpResponse(
+            _stream_search(ebay_service, keywords, max_items or settings.EBAY_DEEP_SEARCH_MAX_ITEMS),
+            content_type='application/x-ndjson',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    # Stored listings answer without an eBay call when there are enough
+    # recent ones; live=1 skips them.
+    local = None
+    if settings.LOCAL_ESTIMATE_ENABLED and not deep and request.GET.get('live') != '1':
+        local = local_estimate(keywords)
+        if local['sufficient']:
+            return _local_estimate_response(local)
     
-    prices = [Decimal(str(float(r['price']))) for r in results]
-    suggestion = PriceSuggestionService.calculate_suggestion(prices)
+    try:
+        if deep:
+            results = ebay_service.deep_search(keywords, max_items=max_items)
+        else:
+            results = ebay_service.search_products(keywords)
+    except RateLimitExceeded as exc:
+        if local and local['matches']:
+            return _local_estimate_response(local)
+        return _rate_limited_response(exc)
     
+    cents = [r.price_cents for r in results]
+    return JsonResponse({
+        'results': [_result_payload(r) for r in results],
+        'suggestion': _suggestion_payload(PriceSuggestionService.summarize_cents(cents), len(cents)),
+        'source': 'ebay',
+    })
+
+
+def _local_estimate_response(local: dict) -> JsonResponse:
     return JsonResponse({
-        'results': [
-            {
-                'title': r['title'],
-                'description': r.get('description', ''),
-                'price': float(r['price']),
-                'currency': r['currency'],
-                'seller': r['seller'],
-                'url': r['item_url'],
-                'condition': r['condition'],
+        'results': [_result_payload(r) for r in local['listings'][:LOCAL_RESULTS_LIMIT]],
+        'suggestion': _suggestion_payload(local['summary'], local['matches']),
+        'source': 'local',
+        'as_of': local['as_of'].isoformat(),
+    })
+
+
+@login_required
+@require_POST
+def api_search_batch(request):
+    """
+    Price several keyword sets in one request.
+
+    Expects a JSON body ``{"keywords": ["...", ...], "deadline": <seconds>}``;
+    each entry may also be a list of terms. Entries of any other type get
+    a per-entry error. Duplicate keyword sets are searched once. Results come back in request order, each with either a
+    ``suggestion`` or an ``error``; keyword sets not searched before the
+    deadline are reported with ``status: "timeout"``.
+    """
+    try:
+        body = json.loads(request.body or b'{}')
+        entries = body['keywords']
+        deadline = min(float(body.get('deadline', settings.EBAY_BATCH_SEARCH_DEADLINE)),
+                       settings.EBAY_BATCH_SEARCH_DEADLINE)
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'error': 'Expected a JSON body with a "keywords" list'}, status=400)
+    
+    if not isinstance(entries, list) or not entries:
+        return JsonResponse({'error': 'Keywords required'}, status=400)
+    if len(entries) > settings.EBAY_BATCH_SEARCH_MAX_KEYWORDS:
+        return JsonResponse(
+            {'error': f'At most {settings.EBAY_BATCH_SEARCH_MAX_KEYWORDS} keyword sets per batch'},
+            status=400,
+        )
+    
+    requested = []
+    for entry in entries:
+        if isinstance(entry, list) and all(isinstance(term, str) for term in entry):
+            entry = ' '.join(entry)
+        requested.append(normalize_keywords(entry) if isinstance(entry, str) else None)
+    unique = [keywords for keywords in dict.fromkeys(requested) if keywords]
+    
+    # Batch priority leaves the interactive reserve to users waiting on a
+    # page, and no search waits for call budget past the batch deadline.
+    started = time.monotonic()
+    deadline = max(deadline, 0.0)
+    ebay_service = EbayAPIService(priority=PRIORITY_BATCH, wait_until=started + deadline)
+    searched = ebay_service.search_many(unique, deadline=deadline)
+    
+    payloads = {}
+    for keywords in unique:
+        outcome = searched.get(keywords)
+        if outcome is None:
+            payloads[keywords] = {'status': 'timeout', 'error': 'Deadline exceeded'}
+        elif isinstance(outcome, RateLimitExceeded):
+            payloads[keywords] = {
+                'status': 'rate_limited', 'error': str(outcome), 'retry_after': outcome.retry_after,
+            }
+        elif isinstance(outcome, Exception):
+            payloads[keywords] = {'status': 'error', 'error': str(outcome) or type(outcome).__name__}
+        else:
+            cents = [r.price_cents for r in outcome]
+            payloads[keywords] = {
+                'status': 'ok',
+                'suggestion': _suggestion_payload(PriceSuggestionService.summarize_cents(cents), len(cents)),
             }
-            for r in results
-        ],
-        'suggestion': {
-            'min_price': float(suggestion['min_price']),
-            'max_price': float(suggestion['max_price']),
-            'average_price': float(suggestion['average_price']),
-            'median_price': float(suggestion['median_price']),
-            'suggested_price': float(suggestion['suggested_price']),
-            'total_listings': suggestion['total_listings'],
-        }
+    
+    results = []
+    for entry, keywords in zip(entries, requested):
+        if keywords is None:
+            payload = {'status': 'error', 'error': 'Keywords must be a string or a list of strings'}
+        else:
+            payload = payloads.get(keywords, {'status': 'error', 'error': 'Keywords required'})
+        results.append(dict(payload, keywords=entry if isinstance(entry, str) or keywords is None else keywords))
+    
+    return JsonResponse({
+        'results': results,
+        'searched': len(unique),
+        'elapsed_ms': round((time.monotonic() - started) * 1000),
+    })
+
+
+def _stream_search(ebay_service: EbayAPIService, keywords: str, max_items: int):
+    """
+    Yield NDJSON lines: an ``estimate`` record priced from stored listings
+    (when any match), one ``page`` record per page of listings as it is
+    fetched, then a closing ``summary`` record. Only prices (as integer
+    cents) are retained between pages.
+    """
+    if settings.LOCAL_ESTIMATE_ENABLED:
+        local = local_estimate(keywords)
+        if local['matches']:
+            yield json.dumps({
+                'type': 'estimate',
+                'suggestion': _suggestion_payload(local['summary'], local['matches']),
+                'sufficient': local['sufficient'],
+                'as_of': local['as_of'].isoformat(),
+            }) + '\n'
+    
+    cents = array('q')
+    try:
+        with closing(_search_pages(ebay_service, keywords, max_items)) as pages:
+            for page in pages:
+                page = page[:max_items - len(cents)]
+                cents.extend(r.price_cents for r in page)
+                yield json.dumps({'type': 'page', 'results': [_result_payload(r) for r in page]}) + '\n'
+                if len(cents) >= max_items:
+                    break
+    except RateLimitExceeded as exc:
+        yield json.dumps({'type': 'error', 'error': str(exc), 'retry_after': exc.retry_after}) + '\n'
+    
+    summary = PriceSuggestionService.summarize_cents(cents)
+    yield json.dumps({'type': 'summary', 'suggestion': _suggestion_payload(summary, len(cents))}) + '\n'
+
+
+def _search_pages(ebay_service: EbayAPIService, keywords: str, max_items: int):
+    pages = ebay_service.iter_search_pages(keywords, max_items=max_items)
+    try:
+        first_page = next(pages)
+    except requests.RequestException:
+        yield ebay_service._get_demo_results(keywords)[:max_items]
+        return
+    yield first_page
+    yield from pages
+
+
+def _rate_limited_response(exc: RateLimitExceeded) -> JsonResponse:
+    response = JsonResponse({'error': str(exc), 'retry_after': exc.retry_after}, status=429)
+    if exc.retry_after is not None:
+        response['Retry-After'] = str(max(int(exc.retry_after + 0.999), 1))
+    return response
+
+
+def _result_payload(result: Listing) -> dict:
+    return {
+        'title': result.title,
+        'description': result.description,
+        'price': result.price_cents / 100,
+        'currency': result.currency,
+        'seller': result.seller,
+        'url': result.item_url,
+        'condition': result.condition,
+    }
+
+
+def _suggestion_payload(summary: Optional[dict], total_listings: int) -> dict:
+    if summary is None:
+        summary = dict(PriceSuggestionService.calculate_suggestion([]), percentiles={})
+    return {
+        'min_price': float(summary['min_price']),
+        'max_price': float(summary['max_price']),
+        'average_price': float(summary['average_price']),
+        'median_price': float(summary['median_price']),
+        'suggested_price': float(summary['suggested_price']),
+        'total_listings': total_listings,
+        'percentiles': {
+            str(pct): float(value) for pct, value in summary['percentiles'].items()
+        },
+    }
+
+
+@login_required
+def api_quota(request):
+    
+    search_cache = get_search_cache()
+    coalescing = dict(search_cache.stats.snapshot(), saved_calls=search_cache.saved_calls())
+    
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return JsonResponse({'enabled': False, 'search_cache': coalescing})
+    return JsonResponse(dict(limiter.status(), enabled=True, search_cache=coalescing))
+
+
+def metrics(request):
+    """Request, phase and eBay call histograms in the Prometheus text format."""
+    
+    token = settings.METRICS_TOKEN
+    allowed = bool(token) and hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(), f"Bearer {token}".encode()
+    )
+    if not allowed and settings.METRICS_ALLOW_LOOPBACK:
+        allowed = request.META.get('REMOTE_ADDR') in ('127.0.0.1', '::1')
+    if not allowed:
+        return HttpResponseForbidden()
+    
+    body = render_prometheus(
+        counter_lines(
+            'finder_search_cache_events_total', "eBay search cache hits, misses and coalesced calls.",
+            'event', get_search_cache().stats.snapshot(),
+        )
+        + counter_lines(
+            'finder_recognition_cache_events_total', "Vision recognition cache hits and misses.",
+            'event', recognition_cache.stats.snapshot(),
+        )
+    )
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@login_required
+def api_trend(request):
+    
+    keywords = request.GET.get('keywords', '')
+    product_id = request.GET.get('product')
+    if product_id:
+        try:
+            product_id = int(product_id)
+        except ValueError:
+            return JsonResponse({'error': 'product must be an integer'}, status=400)
+        product_image = get_object_or_404(ProductImage, pk=product_id)
+        keywords = product_image.detected_label
+    
+    if not keywords:
+        return JsonResponse({'error': 'Keywords or product required'}, status=400)
+    
+    try:
+        days = min(max(int(request.GET.get('days', 90)), 1), 3660)
+    except ValueError:
+        return JsonResponse({'error': 'days must be an integer'}, status=400)
+    
+    return JsonResponse({
+        'keywords': keywords,
+        'points': trend(keywords, since=timezone.now() - timedelta(days=days)),
     })
 
 